@@ -0,0 +1,40 @@
+import json
+import time
+
+import click
+
+from extractdebug.batch import collect_inputs, run_batch
+from extractdebug.extractors.scope import ProjectScope
+from extractdebug.options import extraction_options, create_config, default_jobs
+
+
+@click.command(context_settings={'default_map': {'jobs': default_jobs()}})
+@extraction_options
+@click.option('--manifest', type=click.Path(exists=True, dir_okay=False), help='File listing binaries to process, one path per line.')
+@click.option('--summary', type=click.File('w'), default='-', help='File the JSON summary of processed binaries is written to.')
+@click.argument('inputs', nargs=-1, type=click.Path(exists=True))
+def batch(inputs, formats, includes, output_dir, incremental, pointers_table, jobs, cache, cache_dir, cache_size, only, include_path, exclude_path, manifest, summary):
+    """Extracts every binary given directly, found in given directories or listed in the manifest
+
+    Headers of every binary are written into a subdirectory of the output directory named after its path.
+    """
+    config = create_config(includes, output_dir, incremental, pointers_table, only)
+
+    binaries = collect_inputs(inputs, manifest)
+    if not binaries:
+        raise click.UsageError('No input binaries given')
+
+    start = time.perf_counter()
+    scope = ProjectScope(include_path, exclude_path) if include_path or exclude_path else None
+    summaries = run_batch(binaries, formats, config, jobs=jobs, cache=(cache_dir, cache_size * 1024 * 1024) if cache else None, only=only, scope=scope)
+    failed = sum(binary['status'] != 'ok' for binary in summaries)
+
+    json.dump({'seconds': time.perf_counter() - start, 'failed': failed, 'binaries': summaries}, summary, indent=2)
+    summary.write('\n')
+
+    if failed:
+        raise click.ClickException(f'{failed} of {len(summaries)} binaries failed')
+
+
+if __name__ == '__main__':
+    batch()
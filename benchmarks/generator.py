@@ -0,0 +1,171 @@
+"""Generates and compiles synthetic C++ projects, run as python -m benchmarks.generator outputDir"""
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+
+
+class ProjectConfig:
+    def __init__(self, **kwargs):
+        self.units = kwargs.get('units', 20)
+        self.classes = kwargs.get('classes', 10)
+        self.inheritance_depth = kwargs.get('inheritance_depth', 3)
+        self.namespaces = kwargs.get('namespaces', 2)
+        self.unions = kwargs.get('unions', 1)
+        self.enums = kwargs.get('enums', 1)
+        self.templates = kwargs.get('templates', 2)
+        # Every unit includes this many headers of preceding units, which repeats their types in its DWARF
+        self.shared_headers = kwargs.get('shared_headers', 3)
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+def generate(directory, config):
+    """Writes headers to directory/inc and units to directory, returns paths of the units"""
+    include_dir = os.path.join(directory, 'inc')
+    os.makedirs(include_dir, exist_ok=True)
+
+    sources = []
+    for unit in range(config.units):
+        write_file(os.path.join(include_dir, f'module{unit}.h'), header_source(unit, config))
+
+        source_path = os.path.join(directory, f'module{unit}.cpp')
+        write_file(source_path, unit_source(unit, config))
+        sources.append(source_path)
+
+    # Units without include directories are not supported, so main includes a header as well
+    main_path = os.path.join(directory, 'main.cpp')
+    write_file(main_path, '#include "module0.h"\n\nint main() {\n    return 0;\n}\n')
+    sources.append(main_path)
+
+    return sources
+
+
+def compile_project(directory, sources, output, jobs=None, compiler='g++'):
+    """Compiles sources with debugging information and links them into output"""
+    # pyelftools does not support DWARF 5 which is the default of recent compilers
+    flags = ['-g', '-gdwarf-4', '-O0', '-Iinc']
+
+    def compile_unit(source):
+        object_path = os.path.splitext(source)[0] + '.o'
+        subprocess.run([compiler, *flags, '-c', source, '-o', object_path], cwd=directory, check=True)
+        return object_path
+
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as executor:
+        objects = list(executor.map(compile_unit, sources))
+
+    subprocess.run([compiler, *objects, '-o', output], cwd=directory, check=True)
+    return output
+
+
+def namespace_names(unit, config):
+    return [f'ns{level}' if level else f'module{unit}' for level in range(config.namespaces)]
+
+
+def header_source(unit, config):
+    guard = f'MODULE{unit}_H'
+    lines = [f'#ifndef {guard}', f'#define {guard}', '']
+
+    if config.templates:
+        lines += ['template <typename T>', f'struct Box{unit} {{', '    T value;', '    T get() const { return value; }', '};', '']
+
+    namespaces = namespace_names(unit, config)
+    for namespace in namespaces:
+        lines.append(f'namespace {namespace} {{')
+    lines.append('')
+
+    for index in range(config.classes):
+        lines += class_source(unit, index, config)
+
+    for namespace in reversed(namespaces):
+        lines.append(f'}} // namespace {namespace}')
+
+    lines += ['', f'#endif // {guard}', '']
+    return '\n'.join(lines)
+
+
+def class_source(unit, index, config):
+    name = f'Class{unit}_{index}'
+    depth = config.inheritance_depth
+    base = f' : public Class{unit}_{index - 1}' if depth > 1 and index % depth else ''
+
+    lines = [f'class {name}{base} {{', 'public:']
+    for enum in range(config.enums):
+        lines += [f'    enum State{enum} {{', f'        FIRST{enum} = 0,', f'        SECOND{enum} = {index + 1},', '    };']
+
+    lines += [
+        f'    {name}();',
+        f'    {name}(int value);',
+        f'    virtual ~{name}();',
+        f'    virtual int compute{index}(long some, char const * other);',
+        f'    static {name} * create(double factor);',
+        '    int value;',
+        '    char const * label;',
+        '    double ** matrix;',
+        f'    int table[{index + 2}];',
+    ]
+
+    for union in range(config.unions):
+        lines += ['    union {', f'        int integer{union};', f'        float real{union};', f'        char bytes{union}[8];', '    };']
+
+    lines += ['private:', '    long hidden;', '};', '']
+    return lines
+
+
+def unit_source(unit, config):
+    namespace = '::'.join(namespace_names(unit, config))
+    lines = [f'#include "module{unit}.h"']
+    for shared in range(max(0, unit - config.shared_headers), unit):
+        lines.append(f'#include "module{shared}.h"')
+    lines.append('')
+
+    for index in range(config.classes):
+        name = f'{namespace}::Class{unit}_{index}'
+        short = f'Class{unit}_{index}'
+        lines += [
+            f'{name}::{short}() : value(0), label("{short}"), matrix(nullptr), hidden(0) {{}}',
+            f'{name}::{short}(int value) : value(value), label("{short}"), matrix(nullptr), hidden(value) {{}}',
+            f'{name}::~{short}() {{}}',
+            f'int {name}::compute{index}(long some, char const * other) {{ return value + some + (other ? 1 : 0); }}',
+            f'{name} * {name}::create(double factor) {{ return new {short}(static_cast<int>(factor)); }}',
+            ''
+        ]
+
+    # Templates are only emitted for instantiations used by the unit
+    for template in range(config.templates):
+        lines += [f'int useBox{unit}_{template}() {{', f'    Box{unit}<{["int", "double", "long"][template % 3]}> box{{}};',
+                  '    return static_cast<int>(box.get());', '}', '']
+
+    # Types of shared headers are used, so that their definitions are emitted again
+    for shared in range(max(0, unit - config.shared_headers), unit):
+        shared_namespace = '::'.join(namespace_names(shared, config))
+        lines += [f'int useShared{unit}_{shared}() {{', f'    {shared_namespace}::Class{shared}_0 object;', '    return object.value;', '}', '']
+
+    return '\n'.join(lines)
+
+
+def write_file(path, contents):
+    with open(path, 'w') as file:
+        file.write(contents)
+
+
+@click.command()
+@click.argument('output', type=click.Path(file_okay=False))
+@click.option('--units', type=click.IntRange(min=1), default=20, help='Number of translation units, each with its own header.')
+@click.option('--classes', type=click.IntRange(min=1), default=10, help='Classes per header.')
+@click.option('--inheritance-depth', type=click.IntRange(min=1), default=3)
+@click.option('--namespaces', type=click.IntRange(min=0), default=2, help='Nesting depth of namespaces in headers.')
+@click.option('--unions', type=click.IntRange(min=0), default=1, help='Anonymous unions per class.')
+@click.option('--enums', type=click.IntRange(min=0), default=1, help='Enums per class.')
+@click.option('--templates', type=click.IntRange(min=0), default=2, help='Template instantiations per unit.')
+@click.option('--shared-headers', type=click.IntRange(min=0), default=3, help='Headers of other units included by every unit.')
+@click.option('--jobs', type=click.IntRange(min=1), default=None, help='Number of parallel compiler processes.')
+def main(output, jobs, **kwargs):
+    sources = generate(output, ProjectConfig(**kwargs))
+    print(os.path.join(output, compile_project(output, sources, 'program', jobs)))
+
+
+if __name__ == '__main__':
+    main()
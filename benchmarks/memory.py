@@ -0,0 +1,80 @@
+"""Reports memory used by extracted model objects per member, run as python -m benchmarks.memory someFile"""
+import gc
+import sys
+import tracemalloc
+from collections import Counter
+
+import click
+
+from extractdebug.extractors import extractor as model
+from extractdebug.extractors.dwarf import DwarfExtractor
+
+MEMBER_CLASSES = (model.Field, model.Method, model.Parameter, model.Enumerator)
+
+
+def iter_reachable(root):
+    """Yields model objects and containers reachable from root, each once"""
+    seen = set()
+    stack = [root]
+    while stack:
+        value = stack.pop()
+        if id(value) in seen:
+            continue
+
+        if isinstance(value, (list, tuple)):
+            seen.add(id(value))
+            yield value
+            stack.extend(value)
+        elif type(value).__module__ == model.__name__ and hasattr(type(value), '__slots__'):
+            seen.add(id(value))
+            yield value
+            stack.extend(getattr(value, name) for name in type(value).__slots__)
+        elif isinstance(value, model.ExtractorResult):
+            stack.extend([value.elements, list(value.files.values())])
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+
+
+def dict_layout_size(value):
+    """Size the object would have as a plain instance with its attributes in __dict__"""
+    plain = type(type(value).__name__, (), {})()
+    plain.__dict__.update((name, getattr(value, name)) for name in type(value).__slots__)
+    return sys.getsizeof(plain) + sys.getsizeof(plain.__dict__)
+
+
+@click.command()
+@click.argument('input', type=click.File('rb'))
+def benchmark(input):
+    tracemalloc.start()
+    result = DwarfExtractor().extract(input)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    counts = Counter()
+    slots_bytes = dict_bytes = container_bytes = 0
+    for value in iter_reachable(result):
+        size = sys.getsizeof(value)
+        if isinstance(value, (list, tuple)):
+            container_bytes += size
+            continue
+
+        counts[type(value).__name__] += 1
+        slots_bytes += size
+        dict_bytes += dict_layout_size(value)
+
+    members = sum(counts[cls.__name__] for cls in MEMBER_CLASSES)
+    print(f'{"class":<18}{"objects":>10}')
+    for name, count in counts.most_common():
+        print(f'{name:<18}{count:>10}')
+
+    print()
+    print(f'members (fields, methods, parameters, enumerators): {members}')
+    print(f'model objects with slots:    {slots_bytes / 1024:>10.1f} KB, {(slots_bytes + container_bytes) / max(members, 1):>7.1f} B per member')
+    print(f'model objects with __dict__: {dict_bytes / 1024:>10.1f} KB, {(dict_bytes + container_bytes) / max(members, 1):>7.1f} B per member')
+    print(f'lists and tuples:            {container_bytes / 1024:>10.1f} KB')
+    print(f'retained after extraction:   {retained / (1 << 20):>10.1f} MB, peak {peak / (1 << 20):.1f} MB')
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,148 @@
+"""Times process and convert on a generated project and compares results with a baseline, run as python -m benchmarks.suite"""
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+
+from benchmarks.generator import ProjectConfig, generate, compile_project
+from extractdebug.processor import process, convert
+from extractdebug.stats import Stats, peak_rss
+
+FORMATS = ('cpp', 'pointers_cpp')
+
+# Metrics compared with the baseline, True when higher values are better
+METRICS = {
+    'process_seconds': False,
+    'convert_seconds': False,
+    'dies_per_second': True,
+    'headers_per_second': True,
+    'peak_rss': False,
+}
+
+
+def run_case(directory, binary, format):
+    """Runs one extraction and conversion, called in a fresh process so that peak memory is its own"""
+    os.chdir(directory)
+    shutil.rmtree('output', ignore_errors=True)
+    stats = Stats()
+
+    with open(binary, 'rb') as file:
+        start = time.perf_counter()
+        result = process(file, stats=stats)
+        process_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        convert(result, [format], {'includes': True}, stats=stats)
+        convert_seconds = time.perf_counter() - start
+
+    dies = stats.counters.get('dies_decoded', 0) + stats.counters.get('dies_skipped', 0)
+    headers = stats.counters.get('files_written', 0)
+    return {
+        'process_seconds': process_seconds,
+        'convert_seconds': convert_seconds,
+        'dies': dies,
+        'headers': headers,
+        'dies_per_second': dies / process_seconds if process_seconds else 0,
+        'headers_per_second': headers / convert_seconds if convert_seconds else 0,
+        'peak_rss': peak_rss()[0],
+    }
+
+
+def measure(directory, binary, format, repeat):
+    """Returns the fastest of repeated runs, each in a new process"""
+    runs = []
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            runs.append(executor.submit(run_case, directory, binary, format).result())
+
+    return min(runs, key=lambda run: run['process_seconds'] + run['convert_seconds'])
+
+
+def compare(results, baseline, tolerance):
+    """Prints changes against baseline, returns names of metrics which regressed more than tolerance"""
+    regressions = []
+    print(f'{"format":<14}{"metric":<20}{"current":>14}{"baseline":>14}{"change":>10}')
+    for format, metrics in results['cases'].items():
+        baseline_metrics = baseline['cases'].get(format)
+        if not baseline_metrics:
+            continue
+
+        for name, higher_is_better in METRICS.items():
+            current, previous = metrics.get(name), baseline_metrics.get(name)
+            if not current or not previous:
+                continue
+
+            change = (current - previous) / previous
+            regressed = -change > tolerance if higher_is_better else change > tolerance
+            if regressed:
+                regressions.append(f'{format} {name}')
+
+            print(f'{format:<14}{name:<20}{current:>14.3f}{previous:>14.3f}{change:>+10.1%}{"  !" if regressed else ""}')
+
+    return regressions
+
+
+def print_results(results):
+    print(f'{"format":<14}{"process [s]":>12}{"convert [s]":>12}{"DIEs/s":>12}{"headers/s":>12}{"peak rss [MB]":>15}')
+    for format, metrics in results['cases'].items():
+        rss = metrics['peak_rss'] / (1 << 20) if metrics['peak_rss'] else 0
+        print(f'{format:<14}{metrics["process_seconds"]:>12.3f}{metrics["convert_seconds"]:>12.3f}'
+              f'{metrics["dies_per_second"]:>12.0f}{metrics["headers_per_second"]:>12.1f}{rss:>15.1f}')
+
+
+@click.command()
+@click.option('--units', type=click.IntRange(min=1), default=20, help='Number of translation units, each with its own header.')
+@click.option('--classes', type=click.IntRange(min=1), default=10, help='Classes per header.')
+@click.option('--inheritance-depth', type=click.IntRange(min=1), default=3)
+@click.option('--namespaces', type=click.IntRange(min=0), default=2, help='Nesting depth of namespaces in headers.')
+@click.option('--unions', type=click.IntRange(min=0), default=1, help='Anonymous unions per class.')
+@click.option('--enums', type=click.IntRange(min=0), default=1, help='Enums per class.')
+@click.option('--templates', type=click.IntRange(min=0), default=2, help='Template instantiations per unit.')
+@click.option('--shared-headers', type=click.IntRange(min=0), default=3, help='Headers of other units included by every unit.')
+@click.option('--format', 'formats', type=click.Choice(FORMATS), multiple=True, help='Formats to benchmark, all by default.')
+@click.option('--repeat', type=click.IntRange(min=1), default=3, help='Runs per format, the fastest one is reported.')
+@click.option('--work-dir', type=click.Path(file_okay=False), default=None, help='Directory of the generated project, kept after the run.')
+@click.option('--baseline', type=click.File('r'), default=None, help='Results of a previous run to compare with.')
+@click.option('--tolerance', type=click.FloatRange(min=0), default=10, help='Allowed regression against the baseline in percent.')
+@click.option('--save', type=click.File('w'), default=None, help='Write results as JSON, usable as a baseline later.')
+def main(formats, repeat, work_dir, baseline, tolerance, save, **kwargs):
+    config = ProjectConfig(**kwargs)
+    directory = os.path.abspath(work_dir or tempfile.mkdtemp(prefix='dwarf2cpp-benchmark-'))
+
+    try:
+        start = time.perf_counter()
+        binary = os.path.join(directory, compile_project(directory, generate(directory, config), 'program'))
+        print(f'Generated and compiled {config.units} units in {time.perf_counter() - start:.1f} s')
+
+        results = {
+            'project': config.as_dict(),
+            'cases': {format: measure(directory, binary, format, repeat) for format in formats or FORMATS}
+        }
+    finally:
+        if not work_dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    print_results(results)
+
+    if save:
+        json.dump(results, save, indent=2)
+
+    if baseline:
+        baseline_results = json.load(baseline)
+        if baseline_results.get('project') != results['project']:
+            print('Baseline was recorded for a different project configuration', file=sys.stderr)
+
+        print()
+        regressions = compare(results, baseline_results, tolerance / 100)
+        if regressions:
+            raise click.ClickException(f'Regressed: {", ".join(regressions)}')
+
+
+if __name__ == '__main__':
+    main()
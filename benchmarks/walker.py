@@ -0,0 +1,34 @@
+"""Reports DIEs decoded and skipped by the DIE walker per compilation unit, run as python -m benchmarks.walker someFile"""
+import time
+
+import click
+
+from extractdebug.extractors.dwarf import DwarfExtractor, Attribute
+
+
+@click.command()
+@click.argument('input', type=click.File('rb'))
+def benchmark(input):
+    extractor = DwarfExtractor()
+
+    start = time.perf_counter()
+    extractor.extract(input)
+    elapsed = time.perf_counter() - start
+
+    print(f'{"offset":>10} {"decoded":>9} {"skipped":>9} {"skipped KB":>10} {"of unit %":>9}  unit')
+    for cu in extractor.dwarf_info.iter_CUs():
+        decoded, skipped, skipped_bytes = extractor.walker.units.get(cu.cu_offset, (0, 0, 0))
+        name = cu.get_top_DIE().attributes[Attribute.NAME].value.decode('utf-8', 'replace')
+        print(f'{cu.cu_offset:>10} {decoded:>9} {skipped:>9} {skipped_bytes / 1024:>10.1f} {percent(skipped_bytes, cu.size):>9.1f}  {name}')
+
+    decoded, skipped, skipped_bytes = [sum(x) for x in zip(*extractor.walker.units.values())]
+    total_size = extractor.dwarf_info.debug_info_sec.size
+    print(f'{"total":>10} {decoded:>9} {skipped:>9} {skipped_bytes / 1024:>10.1f} {percent(skipped_bytes, total_size):>9.1f}  {elapsed:.2f} s')
+
+
+def percent(value, total):
+    return 100 * value / total if total else 0
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -1,21 +1,48 @@
+import sys
+
 import click
 
-from extractdebug.processor import process, convert
+from extractdebug.cache import ExtractionCache
+from extractdebug.extractors.scope import ProjectScope
+from extractdebug.extractors.selection import Selection
+from extractdebug.options import extraction_options, create_config
+from extractdebug.processor import process, process_pipeline, convert
+from extractdebug.stats import Stats
 
 
 @click.command()
-@click.option('--format', type=click.Choice(['cpp', 'pointers_cpp'], case_sensitive=False), default='cpp')
-@click.option('--includes/--no-includes', default=True)
+@extraction_options
+@click.option('--stdout/--no-stdout', default=False, help='Echo generated headers to standard output as well.')
+@click.option('--pipeline', is_flag=True, help='Write headers while extracting, as soon as no later compilation unit adds to them.')
+@click.option('--stats', is_flag=True, help='Print time spent in each phase and counters to standard error.')
+@click.option('--stats-json', type=click.File('w'), help='Write time spent in each phase and counters as JSON to a file.')
 @click.argument('input', type=click.File('rb'))
-def extract(input, format, includes):
-    config = {
-        'includes': includes
-    }
+def extract(input, formats, includes, output_dir, incremental, pointers_table, jobs, cache, cache_dir, cache_size, stdout, only, include_path, exclude_path,
+            pipeline, stats, stats_json):
+    config = create_config(includes, output_dir, incremental, pointers_table, only)
+
+    metrics = Stats()
+    extraction_cache = ExtractionCache(cache_dir, cache_size * 1024 * 1024) if cache else None
+    selection = Selection(only) if only else None
+    scope = ProjectScope(include_path, exclude_path) if include_path or exclude_path else None
+    stream = sys.stdout if stdout else None
+    if pipeline:
+        result = process_pipeline(input, formats, config, stream=stream, jobs=jobs, cache=extraction_cache, stats=metrics, selection=selection, scope=scope)
+    else:
+        result = process(input, jobs=jobs, cache=extraction_cache, stats=metrics, selection=selection, scope=scope)
+        if result:
+            convert(result, formats, config, stream=stream, stats=metrics)
+
+    if not result:
+        raise click.ClickException('Unsupported input file, no debugging information found')
 
-    result = process(input)
-    output = convert(result, format, config)
+    if stdout:
+        print()
 
-    print(output)
+    if stats:
+        click.echo(metrics.report(), err=True)
+    if stats_json:
+        stats_json.write(metrics.to_json() + '\n')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,151 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from extractdebug.cache import ExtractionCache
+from extractdebug.extractors import iter_extractors, PROBE_SIZE
+from extractdebug.extractors.selection import Selection
+from extractdebug.processor import process, convert
+from extractdebug.stats import Stats
+
+
+def collect_inputs(paths, manifest=None):
+    """Returns binaries named by paths and manifest lines, directories are searched for files of a supported format
+
+    Manifest lists one path per line relative to its own directory, empty lines and lines starting with # are ignored.
+    """
+    paths = list(paths)
+    if manifest:
+        with open(manifest) as file:
+            base = os.path.dirname(manifest)
+            paths.extend(os.path.join(base, line.strip()) for line in file if line.strip() and not line.lstrip().startswith('#'))
+
+    inputs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, directories, names in os.walk(path):
+                directories.sort()
+                inputs.extend(os.path.join(root, name) for name in sorted(names) if is_supported(os.path.join(root, name)))
+        else:
+            inputs.append(path)
+
+    return list(dict.fromkeys(os.path.abspath(path) for path in inputs))
+
+
+def is_supported(path):
+    if os.path.islink(path) or not os.path.isfile(path):
+        return False
+
+    try:
+        with open(path, 'rb') as file:
+            header = file.read(PROBE_SIZE)
+    except OSError:
+        return False
+
+    return next(iter_extractors(header), None) is not None
+
+
+def output_subdirectories(inputs):
+    """Returns output subdirectory of every binary, its path relative to the closest directory containing all of them"""
+    if not inputs:
+        return []
+
+    root = os.path.commonpath([os.path.dirname(path) for path in inputs])
+    return [os.path.relpath(path, root) for path in inputs]
+
+
+def run_batch(inputs, formats, config, jobs=1, cache=None, only=(), scope=None):
+    """Extracts and converts every binary into its own subdirectory of the output directory, returns their summaries
+
+    Binaries are scheduled largest first so that the longest ones do not start last, summaries are in input order.
+    cache is a pair of cache directory and size limit in bytes. A failing binary is reported in its summary.
+    """
+    output_dir = config.get('output_dir', 'output')
+    tasks = [(path, dict(config, output_dir=os.path.join(output_dir, subdirectory)))
+             for path, subdirectory in zip(inputs, output_subdirectories(inputs))]
+    order = sorted(range(len(tasks)), key=lambda index: input_size(tasks[index][0]), reverse=True)
+
+    summaries = [None] * len(tasks)
+    if jobs == 1 or len(tasks) < 2:
+        for index in order:
+            summaries[index] = process_binary(*tasks[index], formats, cache, only, scope)
+        return summaries
+
+    arguments = (formats, cache, only, scope)
+    # A worker which dies breaks the whole pool and binaries running or waiting beside it fail with it. They are retried in
+    # fresh pools as long as some of them complete, the rest each in its own process, so only the one killing it fails
+    pending = run_pool(tasks, order, arguments, summaries, min(jobs, len(tasks)))
+    while pending:
+        retried = run_pool(tasks, pending, arguments, summaries, min(jobs, len(pending)))
+        if len(retried) == len(pending):
+            break
+        pending = retried
+
+    for index in pending:
+        if run_pool(tasks, [index], arguments, summaries, 1):
+            summaries[index] = summary(tasks[index][0], tasks[index][1], 'failed', error='Worker process died, e.g. it was killed running out of memory')
+
+    return summaries
+
+
+def run_pool(tasks, indices, arguments, summaries, workers):
+    """Processes tasks of indices in a pool of worker processes, returns indices which did not complete as the pool broke"""
+    broken = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {index: executor.submit(process_binary, *tasks[index], *arguments) for index in indices}
+        for index, future in futures.items():
+            try:
+                summaries[index] = future.result()
+            except BrokenProcessPool:
+                broken.append(index)
+            except Exception as e:
+                summaries[index] = summary(tasks[index][0], tasks[index][1], 'failed', error=describe(e))
+
+    return broken
+
+
+def process_binary(path, config, formats, cache=None, only=(), scope=None):
+    """Extracts and converts one binary, returns its summary, errors are reported in it instead of raised"""
+    stats = Stats()
+    extraction_cache = ExtractionCache(*cache) if cache else None
+    selection = Selection(only) if only else None
+    start = time.perf_counter()
+
+    try:
+        with open(path, 'rb') as file:
+            result = process(file, cache=extraction_cache, stats=stats, selection=selection, scope=scope)
+            if not result:
+                return summary(path, config, 'unsupported', time.perf_counter() - start, stats,
+                               error='Unsupported input file, no debugging information found')
+
+            convert(result, formats, config, stats=stats)
+    except Exception as e:
+        return summary(path, config, 'failed', time.perf_counter() - start, stats, error=describe(e))
+
+    return summary(path, config, 'ok', time.perf_counter() - start, stats, elements=len(result.elements))
+
+
+def summary(path, config, status, seconds=None, stats=None, error=None, elements=None):
+    return {
+        'input': path,
+        'output_dir': config.get('output_dir'),
+        'status': status,
+        'error': error,
+        'seconds': seconds,
+        'elements': elements,
+        'files_written': stats.counters.get('files_written', 0) if stats else None,
+        'phases': {name: {'wall': wall, 'cpu': cpu} for name, (wall, cpu) in stats.phases.items()} if stats else {},
+        'counters': dict(stats.counters) if stats else {}
+    }
+
+
+def input_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def describe(error):
+    return f'{type(error).__name__}: {error}'
@@ -0,0 +1,125 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+from elftools.common.exceptions import ELFError
+from elftools.elf.elffile import ELFFile
+
+from extractdebug.extractors.extractor import ExtractorResult
+
+
+def default_cache_dir():
+    return os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'dwarf2cpp')
+
+
+def build_id(file):
+    """Returns hex encoded GNU build-id of an ELF file or None"""
+    try:
+        elf_file = ELFFile(file)
+        section = elf_file.get_section_by_name('.note.gnu.build-id')
+        if section is None:
+            return None
+
+        for note in section.iter_notes():
+            if note['n_type'] == 'NT_GNU_BUILD_ID':
+                return note['n_desc']
+    except ELFError:
+        pass
+    finally:
+        file.seek(0)
+
+    return None
+
+
+def file_hash(file, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(chunk_size), b''):
+        digest.update(chunk)
+    file.seek(0)
+
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """Content-addressed store of extraction results with size bounded LRU eviction"""
+    def __init__(self, directory=None, max_size=1 << 30):
+        self.directory = directory or default_cache_dir()
+        self.max_size = max_size
+        self._identities = {}
+
+    def identify(self, file):
+        if file not in self._identities:
+            identity = build_id(file)
+            self._identities[file] = f'build-id-{identity}' if identity else f'sha256-{file_hash(file)}'
+
+        return self._identities[file]
+
+    def key(self, file, extractor_class, variant=None):
+        """Variant tells apart results extracted from the same file with different options"""
+        key = f'{self.identify(file)}-{extractor_class.__name__}-{extractor_class.version}'
+        return f'{key}-{variant}' if variant else key
+
+    def load(self, file, extractor_classes, variant=None):
+        for extractor_class in extractor_classes:
+            path = self.__path(self.key(file, extractor_class, variant))
+            try:
+                with open(path, 'rb') as entry:
+                    files, elements, base_dir = pickle.load(entry)
+            except FileNotFoundError:
+                continue
+            except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError):
+                # Corrupted or written by an incompatible version, it will be replaced on store
+                continue
+
+            # Access time drives eviction, mtime is used as it is not affected by noatime mounts. Read-only or shared
+            # cache directories only lose the LRU order
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return ExtractorResult(file, files, elements, base_dir)
+
+        return None
+
+    def store(self, file, extractor_class, result, variant=None):
+        os.makedirs(self.directory, exist_ok=True)
+
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as entry:
+                pickle.dump((result.files, result.elements, result.base_dir), entry, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self.__path(self.key(file, extractor_class, variant)))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+        self.__evict()
+
+    def __path(self, key):
+        return os.path.join(self.directory, f'{key}.pickle')
+
+    def __evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            # Decompressed debug sections are stored here as well and count towards the limit
+            if not name.endswith(('.pickle', '.section')):
+                continue
+
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total_size <= self.max_size:
+                break
+
+            try:
+                os.unlink(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total_size -= size
@@ -1,16 +1,16 @@
+import io
 import os
 from collections import OrderedDict
 
 
 def get_project_files(result):
-    base_path = result.base_dir
     project_files = {}
-    for file_id, file in result.files.items():
-        file.directory = os.path.abspath(file.directory)
-        if file.name != b'<built-in>' and (file.directory.startswith(base_path) or not file.directory.startswith(b'/')):
-            project_files[file_id] = file
+    for files in result.files.values():
+        for file in files.values():
+            if file.in_project:
+                project_files[file.id] = file
 
-    return base_path, project_files
+    return result.base_dir, project_files
 
 
 def relative_path(base_path, file_path):
@@ -44,6 +44,9 @@ def get_utf8(source, name, default):
 
 
 class Entry:
+    # Subclasses declare the name slot, an empty layout keeps them combinable with other slotted bases
+    __slots__ = ()
+
     def __init__(self):
         self.name = None
 
@@ -54,6 +57,44 @@ class Entry:
         return f'{self.__class__.__name__} {self.name}'
 
 
+class Emitter:
+    """Writes code through write, text after each new line is indented by the current nesting level
+
+    Blocks render their children into the same emitter, so every line is written once however deep it is nested.
+    """
+    __slots__ = ('_write', 'prefix')
+
+    def __init__(self, write):
+        self._write = write
+        self.prefix = ''
+
+    def write(self, text):
+        if self.prefix:
+            text = text.replace('\n', '\n' + self.prefix)
+
+        self._write(text)
+
+    def emit(self, entry):
+        """Writes entry, blocks render themselves and other entries are written as their string"""
+        render = getattr(entry, 'render', None)
+        if render:
+            render(self)
+        else:
+            self.write(str(entry))
+
+    def indent(self):
+        self.prefix += ' ' * 4
+
+    def dedent(self):
+        self.prefix = self.prefix[:-4]
+
+
+def render_string(entry):
+    buffer = io.StringIO()
+    Emitter(buffer.write).emit(entry)
+    return buffer.getvalue()
+
+
 class EntriesStorage:
     def __init__(self):
         self.quick_access = OrderedDict()
@@ -1,15 +1,35 @@
+from extractdebug.stats import Stats
+
+
 class Converter:
-    def __init__(self, result, config):
+    def __init__(self, result, config, stats=None):
         self.result = result
         self.config = config
+        self.stats = stats or Stats()
+        self.output_dir = config.get('output_dir', 'output')
 
     @staticmethod
     def name():
         raise NotImplementedError
 
-    def convert(self):
+    def convert(self, stream=None, writers=()):
+        """Writes converted files to the output directory and echoes their contents to stream if given
+
+        Writers are converters of other formats sharing the conversion, see shares_conversion, each writes its own files.
+        """
         raise NotImplementedError
 
+    def convert_batches(self, batches, stream=None, writers=()):
+        """Converts elements extracted in batches, see Extractor.iter_extract, by default once all are extracted"""
+        for _ in batches:
+            pass
+
+        self.convert(stream, writers)
+
+    def shares_conversion(self, other):
+        """Checks if other can write its files from elements converted by this converter"""
+        return False
+
 
 class ConverterResultFile:
     def __init__(self, name, directory, relative_path, entries, includes):
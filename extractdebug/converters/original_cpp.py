@@ -1,80 +1,119 @@
 import os
 from collections import defaultdict
+from functools import lru_cache
 import numpy as np
 
-from extractdebug.converters.common import relative_path, test_utf8, get_utf8, EntriesStorage, Entry
+from extractdebug.converters.common import relative_path, test_utf8, get_utf8, EntriesStorage, Entry, Emitter, render_string
 from extractdebug.converters.converter import Converter
+from extractdebug.converters.output import OutputDirectory
 from extractdebug.extractors.extractor import Field, Accessibility, Method, TypeModifier, Union, Namespace, Struct, Class, TypeDef, Type, EnumerationType
 
+TYPE_STRINGS_CACHE_SIZE = 1 << 16
+
 
 class OriginalCPPConverter(Converter):
-    def __init__(self, result, config, on_entry_render=None):
-        super().__init__(result, config)
+    def __init__(self, result, config, on_entry_render=None, stats=None):
+        super().__init__(result, config, stats)
         self.includes = defaultdict(set)
         self.used_types = defaultdict(set)
         self.on_entry_render = on_entry_render
+        self.output = OutputDirectory(self.output_dir, config.get('incremental', False))
 
     @staticmethod
     def name():
         return 'cpp'
 
-    def convert(self):
-        contents = self.__convert_elements(self.result.elements)
-
-        output = ''
-        for file_path, entries in contents.items():
-            file_relative_path = relative_path(self.result.base_dir, file_path).decode('utf-8')
-
-            simple_name = os.path.splitext(os.path.basename(file_relative_path))[0].upper()
-            file_output = f'// Source file: {file_relative_path}\n'
-            file_output += f'#ifndef {simple_name}_H\n#define {simple_name}_H\n\n'
-
-            if self.config['includes']:
-                for included_file_path in self.includes[file_path]:
-                    if included_file_path.startswith(self.result.base_dir):
-                        included_relative_path = relative_path(file_path, included_file_path)
-                        include_name = included_relative_path.decode('utf-8')
-                        file_output += f'#include "{include_name}"\n'
-                    else:
-                        include_name = included_file_path.decode('utf-8')
-                        file_output += f'#include <{include_name}>\n'
-
-                if self.includes[file_path]:
-                    file_output += '\n'
-
-            for entry in entries:
-                if self.on_entry_render:
-                    file_output += f'{self.on_entry_render(entry)}\n\n'
+    def convert(self, stream=None, writers=()):
+        self.convert_batches([(self.result.elements, None)], stream, writers)
+
+    def convert_batches(self, batches, stream=None, writers=()):
+        # Elements are grouped by file until no later batch can add to it, then the file is converted and written
+        writers = [self, *writers]
+        for writer in writers:
+            writer.includes = self.includes
+
+        pending = {}
+        for elements, closed in batches:
+            with self.stats.phase('convert'):
+                for element in elements:
+                    decl_file = self.__get_decl_file(element)
+                    if decl_file:
+                        pending.setdefault(decl_file, []).append(element)
+
+                complete = []
+                for file_path in [file_path for file_path in pending if closed is None or file_path in closed]:
+                    complete += pending.pop(file_path)
+
+                contents = self.__convert_elements(complete)
+
+            for file_path, entries in contents.items():
+                for writer in writers:
+                    writer.__write_file(file_path, entries, stream)
+
+        for writer in writers:
+            writer.stats.count('files_removed', writer.output.finish(remove_stale=writer.config.get('remove_stale', True)))
+
+    def shares_conversion(self, other):
+        return isinstance(other, OriginalCPPConverter)
+
+    def __write_file(self, file_path, entries, stream):
+        file_relative_path = relative_path(self.result.base_dir, file_path).decode('utf-8')
+
+        with self.stats.phase('write'):
+            def render(write):
+                if stream:
+                    write_file = write
+
+                    def write(text):
+                        write_file(text)
+                        stream.write(text)
+
+                self.__write_header(write, file_path, file_relative_path, entries)
+
+            written = self.output.write(file_relative_path, render)
+
+        if written is None:
+            self.stats.count('files_unchanged')
+        else:
+            self.stats.count('files_written')
+            self.stats.count('bytes_written', written)
+
+    def __write_header(self, write, file_path, file_relative_path, entries):
+        simple_name = os.path.splitext(os.path.basename(file_relative_path))[0].upper()
+        write(f'// Source file: {file_relative_path}\n')
+        write(f'#ifndef {simple_name}_H\n#define {simple_name}_H\n\n')
+
+        if self.config['includes']:
+            # Sorted, as set order differs between runs and unchanged headers would be rewritten
+            for included_file_path in sorted(self.includes[file_path]):
+                if included_file_path.startswith(self.result.base_dir):
+                    included_relative_path = relative_path(file_path, included_file_path)
+                    include_name = included_relative_path.decode('utf-8')
+                    write(f'#include "{include_name}"\n')
                 else:
-                    file_output += f'{entry}\n\n'
+                    include_name = included_file_path.decode('utf-8')
+                    write(f'#include <{include_name}>\n')
 
-            file_output += '#endif\n\n'
+            if self.includes[file_path]:
+                write('\n')
 
-            output_dir = os.path.join('output', os.path.dirname(file_relative_path))
-            os.makedirs(output_dir, exist_ok=True)
-            output_file_path = os.path.join('output', file_relative_path)
-            with open(output_file_path, 'w') as file:
-                file.write(file_output)
+        emitter = Emitter(write)
+        for entry in entries:
+            self.stats.count(f'entries_{type(entry).__name__[3:].lower()}')
+            if self.on_entry_render:
+                write(f'{self.on_entry_render(entry)}\n\n')
+            else:
+                emitter.emit(entry)
+                write('\n\n')
 
-            output += file_output
-
-        return output
+        write('#endif\n\n')
 
     def __convert_elements(self, elements):
         entries = defaultdict(EntriesStorage)
 
         for element in elements:
-            if not element.decl_file:
-                continue
-
-            # Check if file is in project
-            cu, file = element.decl_file
-            decl_files = self.result.files[cu]
-            if decl_files and file.id not in decl_files:
-                continue
-
-            decl_file = decl_files[file.id].full_path()
-            if b'<built-in>' in decl_file or not decl_file.startswith(self.result.base_dir):
+            decl_file = self.__get_decl_file(element)
+            if not decl_file:
                 continue
 
             if isinstance(element, Namespace):
@@ -127,6 +166,17 @@ class OriginalCPPConverter(Converter):
 
         return entries
 
+    def __get_decl_file(self, element):
+        """Returns full path of the file declaring element, None if it is not a project file"""
+        if not element.decl_file:
+            return None
+
+        decl_file = element.decl_file[1].path
+        if b'<built-in>' in decl_file or not decl_file.startswith(self.result.base_dir):
+            return None
+
+        return decl_file
+
     def __convert_class(self, cls):
         members = self.__convert_members(cls, cls.members)
         inheritance = None
@@ -158,7 +208,7 @@ class OriginalCPPConverter(Converter):
                 ))
 
                 if member.type and member.type.decl_file and member.type.decl_file[1] != member.decl_file[1]:
-                    self.includes[member.decl_file[1].full_path()].add(member.type.decl_file[1].full_path())
+                    self.includes[member.decl_file[1].path].add(member.type.decl_file[1].path)
             elif isinstance(member, Union):
                 converted_members.append(
                     CPPUnion(
@@ -190,7 +240,7 @@ class OriginalCPPConverter(Converter):
                     parameters.append(CPPParameter(name=param_name, type=param.type, offset=param.offset))
 
                     if member.decl_file and param.type and param.type.decl_file and param.type.decl_file[1] != member.decl_file[1]:
-                        self.includes[member.decl_file[1].full_path()].add(param.type.decl_file[1].full_path())
+                        self.includes[member.decl_file[1].path].add(param.type.decl_file[1].path)
 
                 # Handle detecting void type
                 return_type = member.type
@@ -236,16 +286,24 @@ class OriginalCPPConverter(Converter):
 
     @staticmethod
     def type_string(type):
-        modifier_str = OriginalCPPConverter.type_modifiers_string(type.modifiers)
-        name_parts = [x.decode('utf-8') for x in type.namespaces]
+        # Types are rendered for every use, structurally equal ones share the rendered string
+        return OriginalCPPConverter.__render_type(type.name, tuple(type.modifiers), tuple(type.namespaces))
+
+    @staticmethod
+    @lru_cache(maxsize=TYPE_STRINGS_CACHE_SIZE)
+    def __render_type(name, modifiers, namespaces):
+        modifier_str = OriginalCPPConverter.type_modifiers_string(modifiers)
+        name_parts = [x.decode('utf-8') for x in namespaces]
 
-        if type.name and test_utf8(type.name):
-            name_parts.append(f'{type.name.decode("utf-8")}{modifier_str}')
+        if name and test_utf8(name):
+            name_parts.append(f'{name.decode("utf-8")}{modifier_str}')
 
         return '::'.join(name_parts)
 
 
 class CPPParameter:
+    __slots__ = ('name', 'type', 'offset')
+
     def __init__(self, **kwargs):
         self.name = get_utf8(kwargs, 'name', b'<<unknown param name>>')
         self.type = kwargs.get('type', Type(name='<<unknown>>'))
@@ -260,6 +318,8 @@ class CPPParameter:
 
 
 class CPPMethod:
+    __slots__ = ('name', 'type', 'static', 'virtual', 'parameters', 'accessibility', 'low_pc')
+
     def __init__(self, **kwargs):
         self.name = get_utf8(kwargs, 'name', b'<<unknown method name>>')
         self.type = kwargs.get('type', Type(name='<<unknown>>'))
@@ -290,6 +350,8 @@ class CPPMethod:
 
 
 class CPPField:
+    __slots__ = ('name', 'type', 'accessibility', 'static', 'const_value')
+
     def __init__(self, **kwargs):
         self.name = get_utf8(kwargs, 'name', b'<<unknown field name>>')
         self.type = kwargs.get('type', Type(name='<<unknown>>'))
@@ -331,12 +393,14 @@ class CPPField:
 
 
 class CPPBlock:
+    __slots__ = ('children', 'accessibility')
+
     def __init__(self, **kwargs):
         self.children = kwargs.get('children', None)
         self.accessibility = kwargs.get('accessibility', True)
 
-    def __repr__(self):
-        lines = []
+    def render(self, out):
+        out.write('{')
         last_accessibility = None
 
         for member in self.children:
@@ -344,16 +408,26 @@ class CPPBlock:
                 start_with_private = not last_accessibility and member.accessibility == Accessibility.private
 
                 if member.accessibility != last_accessibility and not start_with_private:
-                    lines.append(f'{member.accessibility.name}:')
+                    out.write(f'\n{member.accessibility.name}:')
                     last_accessibility = member.accessibility
 
-            for line in str(member).split('\n'):
-                lines.append(' ' * 4 + line)
+            out.indent()
+            out.write('\n')
+            out.emit(member)
+            out.dedent()
+
+        if not self.children:
+            out.write('\n')
 
-        return '{\n' + '\n'.join(lines) + '\n' + '};'
+        out.write('\n};')
+
+    def __repr__(self):
+        return render_string(self)
 
 
 class CPPUnion(CPPBlock, Entry):
+    __slots__ = ('name', 'anonymous')
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.name = get_utf8(kwargs, 'name', b'<<unknown union name>>')
@@ -362,16 +436,18 @@ class CPPUnion(CPPBlock, Entry):
     def fill_value(self):
         return len(self.children)
 
-    def __repr__(self):
-        output = 'union '
+    def render(self, out):
+        out.write('union ')
 
         if not self.anonymous and self.name:
-            output += self.name + ' '
+            out.write(self.name + ' ')
 
-        return output + super().__repr__()
+        super().render(out)
 
 
 class CPPInheritance:
+    __slots__ = ('cls', 'accessibility')
+
     def __init__(self, **kwargs):
         self.cls = kwargs.get('cls', None)
         self.accessibility = kwargs.get('accessibility', None)
@@ -388,6 +464,8 @@ class CPPInheritance:
 
 
 class CPPClass(Entry):
+    __slots__ = ('name', 'inheritance', 'children')
+
     def __init__(self, **kwargs):
         super().__init__()
         self.name = get_utf8(kwargs, 'name', b'<<unknown cls name>>')
@@ -397,16 +475,22 @@ class CPPClass(Entry):
     def fill_value(self):
         return len(self.children.children)
 
-    def __repr__(self):
-        output = f"class {self.name}"
+    def render(self, out):
+        out.write(f'class {self.name}')
 
         if self.inheritance:
-            output += f' : {self.inheritance}'
+            out.write(f' : {self.inheritance}')
 
-        return output + f' {self.children}'
+        out.write(' ')
+        self.children.render(out)
+
+    def __repr__(self):
+        return render_string(self)
 
 
 class CPPStruct(Entry):
+    __slots__ = ('name', 'children')
+
     def __init__(self, **kwargs):
         super().__init__()
         self.name = get_utf8(kwargs, 'name', b'<<unknown struct name>>')
@@ -415,12 +499,17 @@ class CPPStruct(Entry):
     def fill_value(self):
         return len(self.children.children)
 
+    def render(self, out):
+        out.write(f'struct {self.name} ')
+        self.children.render(out)
+
     def __repr__(self):
-        output = f"struct {self.name}"
-        return f'{output} {self.children}'
+        return render_string(self)
 
 
 class CPPNamespace(Entry):
+    __slots__ = ('name', 'elements')
+
     def __init__(self, **kwargs):
         super().__init__()
         self.name = get_utf8(kwargs, 'name', b'<<unknown namespace name>>')
@@ -432,14 +521,17 @@ class CPPNamespace(Entry):
     def fill_value(self):
         return len(self.elements.children)
 
-    def __repr__(self):
-        output = f'namespace {self.name} '
-        output += str(self.elements)
+    def render(self, out):
+        out.write(f'namespace {self.name} ')
+        self.elements.render(out)
 
-        return output
+    def __repr__(self):
+        return render_string(self)
 
 
 class CPPTypeDef(Entry):
+    __slots__ = ('name', 'type')
+
     def __init__(self, **kwargs):
         super().__init__()
         self.name = get_utf8(kwargs, 'name', b'<<unknown type name>>')
@@ -454,6 +546,8 @@ class CPPTypeDef(Entry):
 
 
 class CPPEnumerator(Entry):
+    __slots__ = ('name', 'value', 'accessibility')
+
     def __init__(self, **kwargs):
         super().__init__()
         self.name = get_utf8(kwargs, 'name', b'<<unknown type name>>')
@@ -468,6 +562,8 @@ class CPPEnumerator(Entry):
 
 
 class CPPEnumerationType(Entry):
+    __slots__ = ('name', 'type', 'enumerators', 'accessibility', 'children')
+
     def __init__(self, **kwargs):
         super().__init__()
         self.name = get_utf8(kwargs, 'name', b'<<unknown type name>>')
@@ -486,5 +582,9 @@ class CPPEnumerationType(Entry):
     def fill_value(self):
         return len(self.enumerators)
 
+    def render(self, out):
+        out.write(f'enum {self.name} ')
+        self.children.render(out)
+
     def __repr__(self):
-        return f'enum {self.name} {self.children}'
+        return render_string(self)
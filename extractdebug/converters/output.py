@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = '.dwarf2cpp-manifest.json'
+
+
+class OutputDirectory:
+    """Directory of generated files, incremental ones keep unchanged files untouched and remove stale ones
+
+    A manifest records hash, size and modification time of every generated file, files with matching size and time
+    are compared by hash without being read. Only files listed in the manifest are ever removed.
+    """
+    def __init__(self, path, incremental=False):
+        self.path = path
+        self.incremental = incremental
+        self.previous = self.__load_manifest() if incremental else {}
+        self.current = {}
+
+    def write(self, relative_path, render):
+        """Writes the file at relative_path, returns number of bytes written, None if it was up to date
+
+        render is called with a function writing text to the file, so the file is streamed piece by piece. Incremental
+        output streams into a temporary file which replaces the file only if its hash differs.
+        """
+        path = os.path.join(self.path, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not self.incremental:
+            with open(path, 'wb') as file:
+                return self.__stream(file, render)
+
+        digest = hashlib.sha256()
+        with open(path + '.tmp', 'wb') as file:
+            size = self.__stream(file, render, digest)
+
+        digest = digest.hexdigest()
+        if self.__is_current(path, self.previous.get(relative_path), digest, size):
+            os.remove(path + '.tmp')
+            self.current[relative_path] = self.__record(path, digest)
+            return None
+
+        os.replace(path + '.tmp', path)
+        self.current[relative_path] = self.__record(path, digest)
+        return size
+
+    @staticmethod
+    def __stream(file, render, digest=None):
+        size = 0
+
+        def write(text):
+            nonlocal size
+            data = text.encode('utf-8')
+            file.write(data)
+            size += len(data)
+            if digest:
+                digest.update(data)
+
+        render(write)
+        return size
+
+    def finish(self, remove_stale=True):
+        """Saves the manifest, with remove_stale files generated before but not now are removed, returns their count"""
+        if not self.incremental:
+            return 0
+
+        removed = 0
+        for relative_path, entry in self.previous.items():
+            if relative_path in self.current:
+                continue
+
+            if not remove_stale:
+                self.current[relative_path] = entry
+                continue
+
+            path = os.path.join(self.path, relative_path)
+            if os.path.isfile(path):
+                os.remove(path)
+                removed += 1
+                self.__remove_empty_parents(path)
+
+        os.makedirs(self.path, exist_ok=True)
+        manifest_path = os.path.join(self.path, MANIFEST_NAME)
+        with open(manifest_path + '.tmp', 'w') as file:
+            json.dump(self.current, file, indent=1, sort_keys=True)
+        os.replace(manifest_path + '.tmp', manifest_path)
+
+        return removed
+
+    @staticmethod
+    def __is_current(path, entry, digest, size):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+
+        if stat.st_size != size:
+            return False
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            return entry['hash'] == digest
+
+        existing = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 16), b''):
+                existing.update(chunk)
+
+        return existing.hexdigest() == digest
+
+    @staticmethod
+    def __record(path, digest):
+        stat = os.stat(path)
+        return {'hash': digest, 'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+    def __remove_empty_parents(self, path):
+        directory = os.path.dirname(path)
+        root = os.path.abspath(self.path)
+        while os.path.abspath(directory) != root and not os.listdir(directory):
+            os.rmdir(directory)
+            directory = os.path.dirname(directory)
+
+    def __load_manifest(self):
+        try:
+            with open(os.path.join(self.path, MANIFEST_NAME)) as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+        return manifest if isinstance(manifest, dict) else {}
@@ -5,76 +5,71 @@ from extractdebug.extractors.extractor import Type, TypeModifier
 
 
 class PointersCPPConverter(OriginalCPPConverter):
-    def __init__(self, result, config):
-        super().__init__(result, config, on_entry_render=self.on_entry_render)
+    def __init__(self, result, config, stats=None):
+        super().__init__(result, config, on_entry_render=self.on_entry_render, stats=stats)
 
     @staticmethod
     def name():
         return 'pointers_cpp'
 
     def on_entry_render(self, entry):
-        output = str(entry)
-        if not isinstance(entry, CPPClass):
-            return output
+        if not isinstance(entry, CPPClass) or not any(isinstance(x, CPPMethod) for x in entry.children.children):
+            return str(entry)
 
-        has_any_method = any([isinstance(x, CPPMethod) for x in entry.children.children])
-        if not has_any_method:
-            return output
-
-        fields = []
+        # Methods are classified in one pass and the class is rendered once, after construct methods are added
         methods = []
         constructors = []
         for sub_entry in entry.children.children:
             if not isinstance(sub_entry, CPPMethod) or sub_entry.name.startswith('~') or not sub_entry.low_pc:
                 continue
 
+            methods.append(sub_entry)
             if entry.name == sub_entry.name:
                 constructors.append(sub_entry)
 
-            address = hex(sub_entry.low_pc)
-            fields.append(CPPField(
-                name=sub_entry.name,
-                type=Type(name=b'unsigned long long'),
-                const_value=address
-            ))
-
-            methods.append(CPPMethodWrapper(
-                method=sub_entry,
-                cls=entry
-            ))
-
-        for constructor in constructors:
-            construct = CPPMethod(
+        # Entries may be shared with converters of other formats, so construct methods are added to a copy
+        if constructors:
+            entry = CPPClass(name=entry.name, inheritance=entry.inheritance, children=entry.children.children + [CPPMethod(
                 name=b'construct',
                 static=True,
-                type=Type(name=entry.name.encode('utf-8'), modifiers=[TypeModifier.pointer]),
+                type=Type(name=entry.name.encode('utf-8'), modifiers=(TypeModifier.pointer,)),
                 parameters=constructor.parameters,
                 accessibility=constructor.accessibility
-            )
-
-            entry.children.children.append(construct)
-            output = str(entry)
+            ) for constructor in constructors])
 
+        output = [str(entry)]
         if methods:
-            output += '\n\nextern unsigned long long BASE_ADDRESS;\n\n'
+            output.append('\n\nextern unsigned long long BASE_ADDRESS;\n\n')
 
         for constructor in constructors:
-            construct = CPPConstructor(
-                method=constructor,
-                cls=entry
-            )
-            output += f'{construct}\n\n'
+            output.append(f'{CPPConstructor(method=constructor, cls=entry)}\n\n')
 
         for method in methods:
-            output += f'{method}\n\n'
+            output.append(f'{CPPMethodWrapper(method=method, cls=entry)}\n\n')
+
+        output.append(f'\n{self.__render_addresses(entry, methods)}')
+        return ''.join(output)
 
-        namespace = CPPNamespace(name=f'PTR_{entry.name}', elements=fields)
-        output += f'\n{namespace}'
+    def __render_addresses(self, entry, methods):
+        """Renders namespace with addresses of methods, either as fields or as one table sorted by address"""
+        if not methods or not self.config.get('pointers_table'):
+            return str(CPPNamespace(name=f'PTR_{entry.name}', elements=[CPPField(
+                name=method.name,
+                type=Type(name=b'unsigned long long'),
+                const_value=hex(method.low_pc)
+            ) for method in methods]))
 
-        return output
+        rows = ''.join(f'        {{ "{name}", {hex(address)} }},\n' for address, name in sorted((method.low_pc, method.name) for method in methods))
+        return f'namespace PTR_{entry.name} {{\n' \
+               f'    struct {{ char const * name; unsigned long long address; }} const methods[] = {{\n' \
+               f'{rows}' \
+               f'    }};\n' \
+               f'}};'
 
 
 class CPPMethodWrapper(Entry):
+    __slots__ = ('name', 'cls', 'method')
+
     def __init__(self, **kwargs):
         super().__init__()
         self.cls = kwargs.get('cls', None)
@@ -123,6 +118,8 @@ class CPPMethodWrapper(Entry):
 
 
 class CPPConstructor(Entry):
+    __slots__ = ('name', 'cls', 'method')
+
     def __init__(self, **kwargs):
         super().__init__()
         self.cls = kwargs.get('cls', None)
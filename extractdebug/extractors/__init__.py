@@ -1,3 +1,15 @@
-from extractdebug.extractors.dwarf import DwarfExtractor
+from importlib import import_module
 
-all_extractors = [DwarfExtractor]
+# Extractors in probing order as (module, class name, magic), modules are imported only for matching files
+registered_extractors = [
+    ('extractdebug.extractors.dwarf', 'DwarfExtractor', b'\x7fELF'),
+    ('extractdebug.extractors.archive', 'ArchiveExtractor', b'!<arch>\n'),
+]
+
+PROBE_SIZE = 64
+
+
+def iter_extractors(header=b''):
+    for module, name, magic in registered_extractors:
+        if header.startswith(magic):
+            yield getattr(import_module(module), name)
@@ -0,0 +1,102 @@
+import struct
+
+from extractdebug.extractors.mapped import section_data
+from extractdebug.extractors.selection import split_qualified
+
+GDB_INDEX_SYMBOL_KIND_TYPE = 1
+
+
+def find_units(elf_file, dwarf_info, selection, cu_offsets):
+    """Returns offsets of compilation units which may define selected types, or None without accelerator tables
+
+    Units not covered by any table are always returned, tables are often generated only for some objects.
+    """
+    units = set()
+    covered = set()
+    found = False
+
+    for table in (read_gdb_index(elf_file), read_pubtypes(dwarf_info)):
+        if table is None:
+            continue
+
+        found = True
+        table_units, entries = table
+        covered.update(table_units)
+        for cu_offset, name in entries:
+            if cu_offset not in units and selection.includes(split_qualified(name.decode('utf-8', 'replace'))):
+                units.add(cu_offset)
+
+    if not found:
+        return None
+
+    return units | (set(cu_offsets) - covered)
+
+
+def read_pubtypes(dwarf_info):
+    """Returns offsets of units covered by .debug_pubtypes and a generator of their type names
+
+    The section is read directly, NameLUT keeps only one unit per name.
+    """
+    section = dwarf_info.debug_pubtypes_sec
+    if section is None:
+        return None
+
+    data, base = section_data(section)
+    byteorder = '<' if dwarf_info.config.little_endian else '>'
+
+    def read(offset, size):
+        return struct.unpack_from(byteorder + ('I' if size == 4 else 'Q'), data, base + offset)[0]
+
+    sets = []
+    offset = 0
+    while offset < section.size:
+        offset_size, header = 4, offset + 4
+        unit_length = read(offset, 4)
+        if unit_length == 0xffffffff:
+            offset_size, header = 8, offset + 12
+            unit_length = read(offset + 4, 8)
+
+        # Header is followed by version, unit offset and unit size
+        sets.append((read(header + 2, offset_size), header + 2 + 2 * offset_size, header + unit_length, offset_size))
+        offset = header + unit_length
+
+    def entries():
+        for cu_offset, position, end, offset_size in sets:
+            while position < end and read(position, offset_size):
+                name_start = base + position + offset_size
+                name_end = data.find(b'\0', name_start)
+                yield cu_offset, bytes(data[name_start:name_end])
+                position = name_end - base + 1
+
+    return [cu_offset for cu_offset, _, _, _ in sets], entries()
+
+
+def read_gdb_index(elf_file):
+    """Returns offsets of units covered by .gdb_index and a generator of their type names"""
+    section = elf_file.get_section_by_name('.gdb_index')
+    if section is None:
+        return None
+
+    data = section.data()
+    # Symbol kinds are recorded since version 7, the index is always little endian
+    version = struct.unpack_from('<I', data)[0]
+    if version < 7:
+        return None
+
+    cu_list, types_cu_list, _, symbol_table, constant_pool = struct.unpack_from('<5I', data, 4)
+    cu_offsets = [offset for offset, _ in struct.iter_unpack('<QQ', data[cu_list:types_cu_list])]
+
+    def entries():
+        for name_offset, vector_offset in struct.iter_unpack('<II', data[symbol_table:constant_pool]):
+            if not name_offset and not vector_offset:
+                continue
+
+            name_start = constant_pool + name_offset
+            name = data[name_start:data.index(b'\0', name_start)]
+            count = struct.unpack_from('<I', data, constant_pool + vector_offset)[0]
+            for value in struct.unpack_from(f'<{count}I', data, constant_pool + vector_offset + 4):
+                index = value & 0xffffff
+                if (value >> 28) & 0x7 == GDB_INDEX_SYMBOL_KIND_TYPE and index < len(cu_offsets):
+                    yield cu_offsets[index], name
+
+    return cu_offsets, entries()
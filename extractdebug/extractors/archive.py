@@ -0,0 +1,198 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat, chain
+
+from extractdebug.extractors.dwarf import DwarfExtractor
+from extractdebug.extractors.extractor import Extractor, ExtractorResult, Namespace, Class, Struct, Union, EnumerationType, FileTable
+from extractdebug.extractors.mapped import MemoryViewStream, map_file
+from extractdebug.stats import Stats
+
+ARCHIVE_MAGIC = b'!<arch>\n'
+MEMBER_HEADER_SIZE = 60
+ELF_MAGIC = b'\x7fELF'
+
+
+class Member:
+    __slots__ = ('name', 'offset', 'size')
+
+    def __init__(self, **kwargs):
+        self.name = kwargs.get('name', None)
+        self.offset = kwargs.get('offset', 0)
+        self.size = kwargs.get('size', 0)
+
+    def __repr__(self):
+        return f'Member{{name={self.name}, offset={self.offset}, size={self.size}}}'
+
+
+def read_members(file):
+    """Returns ELF members of a System V or BSD ar archive, only member headers are read"""
+    file.seek(0, 2)
+    end = file.tell()
+    file.seek(0)
+    if file.read(len(ARCHIVE_MAGIC)) != ARCHIVE_MAGIC:
+        return None
+
+    members = []
+    long_names = b''
+    offset = len(ARCHIVE_MAGIC)
+    while offset + MEMBER_HEADER_SIZE <= end:
+        file.seek(offset)
+        header = file.read(MEMBER_HEADER_SIZE)
+        if header[58:60] != b'`\n':
+            break
+
+        name = header[:16].rstrip(b' ')
+        data_offset = offset + MEMBER_HEADER_SIZE
+        size = int(header[48:58].strip() or 0)
+        # Members are aligned to two bytes
+        offset = data_offset + size + (size & 1)
+
+        if name == b'//':
+            long_names = file.read(size)
+            continue
+        if name.startswith(b'#1/'):
+            # BSD archives store long names in front of member data
+            name_size = int(name[3:])
+            name = file.read(name_size).rstrip(b'\0')
+            data_offset += name_size
+            size -= name_size
+        elif name.startswith(b'/') and name[1:].isdigit():
+            start = int(name[1:])
+            name = long_names[start:long_names.find(b'/\n', start)]
+        elif name.startswith(b'/') or name.startswith(b'__.SYMDEF'):
+            # Symbol tables
+            continue
+        else:
+            name = name.rstrip(b'/')
+
+        file.seek(data_offset)
+        if file.read(len(ELF_MAGIC)) == ELF_MAGIC:
+            members.append(Member(name=name.decode('utf-8', 'replace'), offset=data_offset, size=size))
+
+    file.seek(0)
+    return members
+
+
+class ArchiveExtractor(Extractor):
+    """Extracts every object of a static library and merges them, definitions from shared headers are kept once"""
+    version = DwarfExtractor.version
+
+    def __init__(self, jobs=1, stats=None, selection=None, sections_dir=None, scope=None):
+        super().__init__(jobs, stats, selection, sections_dir, scope)
+        self.members = None
+
+    def test(self, file):
+        self.members = read_members(file)
+        return bool(self.members)
+
+    def extract(self, file):
+        with self.stats.phase('open'):
+            if self.members is None:
+                self.members = read_members(file)
+
+        path = getattr(file, 'name', None)
+        if self.jobs > 1 and isinstance(path, str) and len(self.members) > 1:
+            with self.stats.phase('walk'):
+                results = list(self.__extract_parallel(path))
+        else:
+            results = list(self.__extract_serial(file))
+
+        self.stats.count('archive_members', len(results))
+        base_dir = os.path.commonpath([base_dir for _, _, base_dir in results]) if results else b'/'
+        files, elements = {}, []
+        with self.stats.phase('merge'):
+            # Files of members are interned again, so that ids are unique in the whole archive
+            file_table = FileTable(base_dir, self.scope)
+            for member_files, _, _ in results:
+                files.update(member_files)
+                for unit_files in member_files.values():
+                    for member_file in unit_files.values():
+                        file_table.adopt(member_file)
+            merge_elements(elements, chain.from_iterable(member_elements for _, member_elements, _ in results))
+
+        return ExtractorResult(file, files, elements, base_dir)
+
+    def __extract_serial(self, file):
+        view = archive_view(file)
+        for member in self.members:
+            result = extract_member(view[member.offset:member.offset + member.size], member.offset, self.stats, self.selection, self.scope)
+            if result:
+                yield result
+
+    def __extract_parallel(self, path):
+        self.stats.count('worker_processes', self.jobs)
+        with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            for result, counters in executor.map(_extract_member, repeat(path), self.members, repeat(self.selection), repeat(self.scope)):
+                for name, value in counters.items():
+                    self.stats.count(name, value)
+                if result:
+                    yield result
+
+
+def archive_view(file):
+    """Returns the whole archive as one mapping, in-memory buffers are used as they are, members are sliced from it"""
+    if isinstance(file, MemoryViewStream):
+        return file.view
+
+    mapping = map_file(file)
+    if mapping is None:
+        file.seek(0)
+        mapping = file.read()
+        file.seek(0)
+
+    return memoryview(mapping)
+
+
+def extract_member(view, unit_base, stats, selection, scope):
+    """Returns files, elements and base directory of an object, None if it has no debugging information"""
+    stream = MemoryViewStream(view)
+    extractor = DwarfExtractor(stats=stats, selection=selection, scope=scope)
+    extractor.unit_base = unit_base
+    if not extractor.test(stream):
+        return None
+
+    result = extractor.extract(stream)
+    return result.files, result.elements, result.base_dir
+
+
+def merge_elements(container, elements):
+    """Appends elements to container, definitions already in it are kept once and the same namespaces are merged"""
+    definitions = {definition_key(element): i for i, element in enumerate(container)}
+    for element in elements:
+        key = definition_key(element)
+        if key is None or key not in definitions:
+            if key is not None:
+                definitions[key] = len(container)
+            container.append(element)
+        elif isinstance(element, Namespace):
+            merge_elements(container[definitions[key]].elements, element.elements)
+        elif definition_size(element) > definition_size(container[definitions[key]]):
+            # A copy with more members carries implicitly declared ones the kept one lacks
+            container[definitions[key]] = element
+
+
+def definition_key(element):
+    if not element.decl_file or isinstance(element, Namespace) and not element.name:
+        return None
+
+    return type(element), element.name, element.decl_file[1].path
+
+
+def definition_size(element):
+    if isinstance(element, (Class, Struct)):
+        return len(element.members)
+    if isinstance(element, Union):
+        return len(element.fields)
+    if isinstance(element, EnumerationType):
+        return len(element.enumerators)
+
+    return 0
+
+
+def _extract_member(path, member, selection, scope):
+    stats = Stats()
+    with open(path, 'rb') as file:
+        view = archive_view(file)
+        result = extract_member(view[member.offset:member.offset + member.size], member.offset, stats, selection, scope)
+
+    return result, stats.counters
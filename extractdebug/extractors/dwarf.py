@@ -1,14 +1,23 @@
 import os
 import re
+import tempfile
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
 from elftools.common.exceptions import ELFError
 from elftools.common.utils import struct_parse
 from elftools.elf.elffile import ELFFile
 
 from extractdebug.converters.common import chunks
+from extractdebug.extractors.accelerators import find_units
 from extractdebug.extractors.extractor import Extractor, Field, Class, ExtractorResult, Accessibility, Method, Parameter, Type, TypeModifier, Union, Struct, Namespace, TypeDef, \
-    File, Enumerator, EnumerationType
+    Enumerator, EnumerationType, FileTable
+from extractdebug.extractors.lines import read_file_entries
+from extractdebug.extractors.mapped import map_file, get_dwarf_info, section_data
+from extractdebug.extractors.selection import Selection
+from extractdebug.extractors.symbols import SymbolIndex
+from extractdebug.extractors.walker import DIEWalker
 
 
 class Tag:
@@ -29,6 +38,7 @@ class Tag:
     ENUMERATION_TYPE = 'DW_TAG_enumeration_type'
     ARRAY_TYPE = 'DW_TAG_array_type'
     SUBRANGE_TYPE = 'DW_TAG_subrange_type'
+    ENUMERATOR = 'DW_TAG_enumerator'
 
 
 class Attribute:
@@ -47,49 +57,417 @@ class Attribute:
     VIRTUALITY = 'DW_AT_virtuality'
     BYTE_SIZE = 'DW_AT_byte_size'
     UPPER_BOUND = 'DW_AT_upper_bound'
+    SIBLING = 'DW_AT_sibling'
+    STMT_LIST = 'DW_AT_stmt_list'
+    DECLARATION = 'DW_AT_declaration'
+
+
+# Only these attributes are decoded, all of them have to be listed in Attribute
+DECODED_ATTRIBUTES = [value for name, value in vars(Attribute).items() if name.isupper()]
+
+# Children with other tags are skipped together with their subtrees without being decoded
+SCOPE_CHILDREN = {Tag.CLASS_TYPE, Tag.UNION_TYPE, Tag.STRUCTURE_TYPE, Tag.SUB_PROGRAM, Tag.NAMESPACE, Tag.TYPEDEF, Tag.ENUMERATION_TYPE}
+MEMBER_CHILDREN = {Tag.INHERITANCE, Tag.SUB_PROGRAM, Tag.MEMBER, Tag.ENUMERATION_TYPE}
+PARAMETER_CHILDREN = {Tag.PARAMETER}
+# Scopes whose methods are defined out of line
+MEMBER_SCOPES = {Tag.CLASS_TYPE, Tag.STRUCTURE_TYPE, Tag.UNION_TYPE}
+# Types whose definitions are extracted together with selected elements using them
+DEPENDENCY_TAGS = {Tag.CLASS_TYPE, Tag.STRUCTURE_TYPE, Tag.UNION_TYPE, Tag.TYPEDEF, Tag.ENUMERATION_TYPE}
+
+CONSTRUCTOR_NAME = re.compile(rb'_ZN[0-9]+([a-zA-z]+)C[0-9]')
+
+
+class Definition:
+    """Class or struct definition shared by all compilation units emitting the same copy of it"""
+    def __init__(self, element, fingerprint):
+        self.element = element
+        self.fingerprint = fingerprint
+        self._methods = None
+
+    def method(self, linkage_name):
+        if self._methods is None:
+            self._methods = {member.linkage_name: member for member in self.element.members if isinstance(member, Method) and member.linkage_name}
+
+        return self._methods.get(linkage_name)
 
 
 class DwarfExtractor(Extractor):
-    def __init__(self):
+    version = 7
+
+    def __init__(self, jobs=1, stats=None, selection=None, sections_dir=None, scope=None):
+        super().__init__(jobs, stats, selection, sections_dir, scope)
+        # Resolved types keyed by the offset of the referenced DIE, shared between all users
         self._types = {}
+        self._scopes = {}
+        self.type_cache_hits = 0
+        self.type_cache_misses = 0
+        # Class and struct definitions keyed by qualified name, declaration file and byte size,
+        # copies repeated by other compilation units are aliased to them instead of being parsed
+        self._definitions = {}
+        self._aliases = {}
+        self.definitions_reused = 0
+        self.units_extracted = 0
+        # Subtrees of scopes declared outside the project, skipped without being parsed
+        self.scopes_skipped = 0
         self._subprograms = {}
-        self._subprograms_name = defaultdict(set)
-        self._subprograms_incomplete = set()
+        # Dicts are used as insertion-ordered sets, so that constructor fixups
+        # do not depend on object hashes and parallel runs match serial ones
+        self._subprograms_name = defaultdict(dict)
+        self._subprograms_incomplete = {}
+        self._pending_specifications = []
+        # Definitions of types used by selected elements, extracted after them
+        self._dependencies = []
+        self._dependency_paths = set()
+        self._skipped_definitions = []
+        self._cu_offsets = None
+        self._opened_file = None
+        self.walker = None
+        self.symbols = None
+        self.mapping = None
+        self.elf_file = None
         self.dwarf_info = None
+        # Files of each unit are keyed by its offset plus unit_base, which keeps the keys of archive members distinct,
+        # line programs are parsed on first use and units referring to the same one share its files
         self.cu_files = {}
+        self._line_programs = {}
+        self._line_data = None
+        self.file_table = None
+        self.unit_base = 0
 
     def test(self, file):
-        """Checks if file contains DWARF debugging data"""
+        """Checks if file contains DWARF debugging data, only ELF and section headers are read"""
         try:
-            elf_file = ELFFile(file)
-            return elf_file.has_dwarf_info() and elf_file.get_dwarf_info().has_debug_info
+            self.__open_elf(file)
         except ELFError:
             return False
 
+        return any(self.elf_file.get_section_by_name(name) for name in ('.debug_info', '.zdebug_info'))
+
     def extract(self, file):
-        self.elf_file = ELFFile(file)
-        self.dwarf_info = self.elf_file.get_dwarf_info()
+        # Selected elements are found in a few units, which is not worth starting workers for
+        path = getattr(file, 'name', None)
+        parallel = self.jobs > 1 and isinstance(path, str) and not self.selection
+        if not parallel or self.sections_dir:
+            return self.__extract(file, path, parallel)
+
+        # Workers map compressed sections inflated here instead of inflating them again
+        with tempfile.TemporaryDirectory(prefix='dwarf2cpp-sections-') as self.sections_dir:
+            result = self.__extract(file, path, parallel)
+        self.sections_dir = None
+
+        return result
+
+    def __extract(self, file, path, parallel):
+        base_dir = self.__open(file)
+        cu_offsets = [cu.cu_offset for cu in self.dwarf_info.iter_CUs()] if parallel else []
+        if self.selection:
+            elements = self.__extract_selected(base_dir)
+        elif len(cu_offsets) > 1:
+            self.walker.release()
+            with self.stats.phase('walk'):
+                elements = self.__extract_parallel(path, cu_offsets)
+        else:
+            # Units are parsed one at a time and released, so memory is bounded by the largest one
+            elements = self.__extract_units(self.dwarf_info.iter_CUs(), release=True)
 
-        elements = []
-        cus = []
-        for cu in self.dwarf_info.iter_CUs():
-            top_die = cu.get_top_DIE()
-            if 'DW_AT_stmt_list' in top_die.attributes:
-                self.cu_files[cu.cu_offset] = self.__parse_files_info(self.dwarf_info, cu.structs, top_die.attributes['DW_AT_stmt_list'].value)
+        with self.stats.phase('addresses'):
+            self.symbols = SymbolIndex(self.elf_file)
+            self.__fix_addresses()
 
-            elements += self.__parse_compilation_unit(cu)
-            cus.append(cu)
+        self.__count()
 
-        self.__fix_constructors()
+        return ExtractorResult(file, self.cu_files, elements, base_dir)
+
+    def iter_extract(self, file):
+        # Methods of a header may be completed by any unit with parallel workers, selected elements wait for dependencies
+        if self.selection or self.jobs > 1:
+            return super().iter_extract(file)
+
+        result = ExtractorResult(file, self.cu_files, [], self.__open(file))
+        return result, self.__iter_batches(result)
+
+    def __iter_batches(self, result):
+        """Yields elements of each unit with paths of files which no later unit lists in its line program"""
+        with self.stats.phase('line_programs'):
+            closing = defaultdict(list)
+            last_units = {}
+            for index, cu in enumerate(self.dwarf_info.iter_CUs()):
+                for file in self.__parse_unit_files(cu).values():
+                    last_units[file.path] = index
+
+            for path, index in last_units.items():
+                closing[index].append(path)
+            self.walker.release()
+
+        # Addresses are assigned when methods are parsed, without symbols they are guessed from all units at the end
+        with self.stats.phase('addresses'):
+            self.symbols = SymbolIndex(self.elf_file)
+
+        closed = set()
+        for index, cu in enumerate(self.dwarf_info.iter_CUs()):
+            elements = self.__extract_units([cu], release=True)
+            result.elements += elements
+            if self.symbols:
+                closed.update(closing[index])
+
+            yield elements, closed
+
+        with self.stats.phase('addresses'):
+            self.__fix_addresses()
+
+        self.__count()
+        yield [], None
+
+    def __open(self, file):
+        """Opens file and prepares DWARF info and walker, returns base directory of the project"""
+        with self.stats.phase('open'):
+            if self._opened_file is not file:
+                self.__open_elf(file)
+            self.dwarf_info = get_dwarf_info(self.elf_file, self.mapping, self.sections_dir)
+            self.walker = DIEWalker(self.dwarf_info, DECODED_ATTRIBUTES)
+            base_dir = self.__get_base_dir(next(self.dwarf_info.iter_CUs()))
+            self.file_table = FileTable(base_dir, self.scope)
+
+            return base_dir
+
+    def __extract_selected(self, base_dir):
+        """Extracts selected elements and their dependencies, DIEs are kept as dependencies refer to them"""
+        all_cus = cus = list(self.dwarf_info.iter_CUs())
+        with self.stats.phase('accelerators'):
+            units = find_units(self.elf_file, self.dwarf_info, self.selection, [cu.cu_offset for cu in cus])
+        if units is not None:
+            cus = [cu for cu in cus if cu.cu_offset in units]
+
+        elements = self.__extract_units(cus)
+        with self.stats.phase('dependencies'):
+            self.__extract_dependencies(elements, base_dir, all_cus)
+
+        return elements
+
+    def extract_shard(self, path, cu_offsets):
+        """Parses only the given compilation units, used by worker processes"""
+        with open(path, 'rb') as file:
+            self.__open_elf(file)
+            self.dwarf_info = get_dwarf_info(self.elf_file, self.mapping, self.sections_dir)
+            self.walker = DIEWalker(self.dwarf_info, DECODED_ATTRIBUTES)
+            self.file_table = FileTable(self.__get_base_dir(next(self.dwarf_info.iter_CUs())), self.scope)
+            self._cu_offsets = set(cu_offsets)
+
+            elements = self.__extract_units((self.dwarf_info.get_CU_at(offset) for offset in cu_offsets), release=True)
+
+        return elements, self.cu_files, self._subprograms, self._subprograms_name, self._subprograms_incomplete, self._pending_specifications, \
+            self._aliases, (self.type_cache_hits, self.type_cache_misses, self.definitions_reused, self.units_extracted, self.scopes_skipped), dict(self.walker.units)
+
+    def __count(self):
+        self.stats.count('compilation_units', self.units_extracted)
+        self.stats.count('dies_decoded', sum(counters[0] for counters in self.walker.units.values()))
+        self.stats.count('dies_skipped', sum(counters[1] for counters in self.walker.units.values()))
+        self.stats.count('type_cache_hits', self.type_cache_hits)
+        self.stats.count('type_cache_misses', self.type_cache_misses)
+        self.stats.count('definitions_reused', self.definitions_reused)
+        self.stats.count('files', len(self.file_table.files))
+        self.stats.count('scopes_skipped', self.scopes_skipped)
 
-        base_dir = cus[0].get_top_DIE().attributes[Attribute.COMP_DIR].value
-        first_file = cus[0].get_top_DIE().attributes[Attribute.NAME].value
+    @staticmethod
+    def __get_base_dir(cu):
+        top_die = cu.get_top_DIE()
+        base_dir = top_die.attributes[Attribute.COMP_DIR].value
+        first_file = top_die.attributes[Attribute.NAME].value
         if os.path.isabs(first_file):
             base_dir = os.path.commonpath([base_dir, first_file])
 
-        return ExtractorResult(file, self.cu_files, elements, base_dir)
+        return base_dir
+
+    def __open_elf(self, file):
+        # Pages of the mapping are shared with other workers reading the same file
+        self.mapping = map_file(file)
+        self.elf_file = ELFFile(self.mapping or file)
+        self._opened_file = file
+
+    def __extract_units(self, cus, release=False):
+        """Parses elements of units, with release their DIEs are dropped after each unit"""
+        elements = []
+        for cu in cus:
+            self.units_extracted += 1
+            with self.stats.phase('walk'):
+                elements += self.__parse_compilation_unit(cu)
+
+            if release:
+                self.walker.release()
+
+        return elements
+
+    def __parse_unit_files(self, cu):
+        """Returns files of the unit by their index in its line program"""
+        unit = self.unit_base + cu.cu_offset
+        files = self.cu_files.get(unit)
+        if files is None:
+            attrs = cu.get_top_DIE().attributes
+            if Attribute.STMT_LIST not in attrs:
+                return {}
+
+            offset = attrs[Attribute.STMT_LIST].value
+            files = self._line_programs.get(offset)
+            if files is None:
+                comp_dir = attrs[Attribute.COMP_DIR].value if Attribute.COMP_DIR in attrs else b''
+                files = self._line_programs[offset] = self.__parse_files_info(cu.structs, offset, comp_dir)
+            self.cu_files[unit] = files
+
+        return files
+
+    def __extract_parallel(self, path, cu_offsets):
+        # Contiguous shards keep the CU order, a few per worker balance uneven CU sizes
+        shard_size = max(1, -(-len(cu_offsets) // (self.jobs * 4)))
+
+        elements = []
+        self.stats.count('worker_processes', self.jobs)
+        with ProcessPoolExecutor(max_workers=self.jobs) as executor:
+            for shard in executor.map(_extract_shard, repeat(path), chunks(cu_offsets, shard_size), repeat(self.sections_dir), repeat(self.scope)):
+                shard_elements, cu_files, subprograms, subprograms_name, subprograms_incomplete, pending_specifications, aliases, (hits, misses, reused, extracted, skipped), units = shard
+
+                elements += shard_elements
+                self.cu_files.update(cu_files)
+                for files in cu_files.values():
+                    for file in files.values():
+                        self.file_table.adopt(file)
+                self._subprograms.update(subprograms)
+                for name, methods in subprograms_name.items():
+                    self._subprograms_name[name].update(methods)
+                self._subprograms_incomplete.update(subprograms_incomplete)
+                self._pending_specifications += pending_specifications
+                self._aliases.update(aliases)
+                self.type_cache_hits += hits
+                self.type_cache_misses += misses
+                self.definitions_reused += reused
+                self.units_extracted += extracted
+                self.scopes_skipped += skipped
+                self.walker.units.update(units)
+
+        for specification_die_offset, parameters, low_pc in self._pending_specifications:
+            if specification_die_offset not in self._subprograms:
+                specification_die = self.dwarf_info.get_DIE_from_refaddr(specification_die_offset)
+                if not self.__resolve_alias(specification_die):
+                    self.__parse_member(specification_die)
+
+            self.__complete_method(self._subprograms[specification_die_offset], parameters, low_pc)
+
+        return elements
+
+    def __extract_dependencies(self, elements, base_dir, cus):
+        """Extracts project types which selected elements derive from or hold into their namespaces"""
+        selection = self.selection
+        while self._dependencies:
+            found = []
+            missing = set()
+            dependencies, self._dependencies = self._dependencies, []
+            for die in dependencies:
+                self.__collect_dependency(die, base_dir, found, missing)
+
+            self.__merge_elements(elements, found)
+            if missing:
+                self._dependency_paths.update(missing)
+                self.selection = Selection('::'.join(path) for path in missing)
+                units = find_units(self.elf_file, self.dwarf_info, self.selection, [cu.cu_offset for cu in cus])
+                self.__merge_elements(elements, self.__extract_units(cu for cu in cus if units is None or cu.cu_offset in units))
+                self.selection = selection
+
+        skipped, self._skipped_definitions = self._skipped_definitions, []
+        for offset in skipped:
+            self.__parse_sub_program(self.dwarf_info.get_DIE_from_refaddr(offset))
+
+    def __collect_dependency(self, die, base_dir, found, missing):
+        """Parses dependency die and adds it to found after its own dependencies, so that types precede their users"""
+        path = self.__get_scope_path(die)
+        if path is None or path in self._dependency_paths or self.selection.includes(path):
+            return
+
+        # Types are often only declared where they are used, their definitions are searched for later
+        if Attribute.DECLARATION in die.attributes:
+            missing.add(path)
+            return
+
+        decl_file = self.__get_file(die)
+        if not decl_file or not decl_file[1].in_project:
+            return
+
+        self._dependency_paths.add(path)
+        element = self.__parse_dependency(die)
+        dependencies, self._dependencies = self._dependencies, []
+        for dependency in dependencies:
+            self.__collect_dependency(dependency, base_dir, found, missing)
+
+        found.append(self.__wrap_in_namespaces(die, element))
+
+    def __parse_dependency(self, die):
+        if die.tag == Tag.CLASS_TYPE:
+            return self.__parse_definition(die, self.__parse_class_type)
+        if die.tag == Tag.STRUCTURE_TYPE:
+            return self.__parse_definition(die, self.__parse_struct_type)
+        if die.tag == Tag.UNION_TYPE:
+            return self.__parse_union_type(die)
+        if die.tag == Tag.TYPEDEF:
+            return self.__parse_typedef(die)
+
+        return self.__parse_enum(die)
+
+    def __wrap_in_namespaces(self, die, element):
+        scope = self.walker.get_parent(die)
+        while scope.tag == Tag.NAMESPACE:
+            element = Namespace(
+                name=scope.attributes[Attribute.NAME].value if Attribute.NAME in scope.attributes else None,
+                elements=[element],
+                decl_file=self.__get_file(scope)
+            )
+            scope = self.walker.get_parent(scope)
+
+        return element
+
+    def __merge_elements(self, container, elements):
+        """Adds dependencies in front of container elements using them, namespaces are merged into the same namespace of the same unit and file"""
+        # Converters keep only one namespace element per name and file
+        for element in reversed(elements):
+            if isinstance(element, Namespace):
+                namespace = next((other for other in container if isinstance(other, Namespace) and other.name == element.name
+                                  and other.decl_file == element.decl_file), None)
+                if namespace:
+                    self.__merge_elements(namespace.elements, element.elements)
+                    continue
+
+            container.insert(0, element)
+
+    def __add_dependency(self, die):
+        """Remembers definition of the type of die unless it is only referred to by a pointer or reference"""
+        entry = die
+        while Attribute.TYPE in entry.attributes:
+            entry = entry.get_DIE_from_attribute(Attribute.TYPE)
+            if entry.tag in (Tag.POINTER_TYPE, Tag.REFERENCE_TYPE):
+                return
+            if entry.tag in DEPENDENCY_TAGS and Attribute.NAME in entry.attributes:
+                self._dependencies.append(entry)
+                return
+
+    def __get_scope_path(self, die):
+        """Qualified name of die declared in namespaces as a tuple of components, None if it is nested in other scope"""
+        path = (self.__get_scope_name(die),)
+        scope = self.walker.get_parent(die)
+        while scope is not None and scope.tag == Tag.NAMESPACE:
+            path = (self.__get_scope_name(scope),) + path
+            scope = self.walker.get_parent(scope)
+
+        return path if scope is not None and scope.tag == 'DW_TAG_compile_unit' else None
+
+    def __fix_addresses(self):
+        """Assigns addresses of methods without an out-of-line definition from the symbol table"""
+        if not self.symbols:
+            self.__fix_constructors()
+            return
+
+        for subprogram in self._subprograms_incomplete:
+            if subprogram.linkage_name:
+                subprogram.low_pc = self.symbols.address(subprogram.linkage_name)
 
     def __fix_constructors(self):
+        # Without symbols the address of any same named method is the best guess
         for subprogram in self._subprograms_incomplete:
             similar = self._subprograms_name[subprogram.name]
             for other_subprogram in similar:
@@ -97,23 +475,40 @@ class DwarfExtractor(Extractor):
                     subprogram.low_pc = other_subprogram.low_pc
                     break
 
-    def __parse_children(self, die):
+    def __parse_children(self, die, scope=None):
+        """Parses elements declared in die, only selected ones unless scope of the die is None"""
         elements = []
 
-        for child in die.iter_children():
+        for child in self.walker.iter_children(die, SCOPE_CHILDREN):
+            # Converters leave out whatever is declared outside the project, types used by the project are resolved by name
+            if child.tag != Tag.SUB_PROGRAM and not self.__in_project(child):
+                self.scopes_skipped += 1
+                continue
+
+            child_scope = None
+            if scope is not None and child.tag != Tag.SUB_PROGRAM:
+                child_scope = scope + (self.__get_scope_name(child),)
+                if self.selection.includes(child_scope):
+                    child_scope = None
+                elif child.tag != Tag.NAMESPACE or not self.selection.may_contain(child_scope):
+                    continue
+
             if child.tag == Tag.CLASS_TYPE:
-                elements.append(self.__parse_class_type(child))
+                elements.append(self.__parse_definition(child, self.__parse_class_type))
             elif child.tag == Tag.UNION_TYPE:
                 elements.append(self.__parse_union_type(child))
             elif child.tag == Tag.STRUCTURE_TYPE:
                 if Attribute.NAME not in child.attributes:
                     continue
 
-                elements.append(self.__parse_struct_type(child))
+                elements.append(self.__parse_definition(child, self.__parse_struct_type))
             elif child.tag == Tag.SUB_PROGRAM:
                 self.__parse_sub_program(child)
             elif child.tag == Tag.NAMESPACE:
-                elements.append(self.__parse_namespace(child))
+                namespace = self.__parse_namespace(child, child_scope)
+                # Namespaces only searched for selected elements are left out when nothing was found in them
+                if child_scope is None or namespace.elements:
+                    elements.append(namespace)
             elif child.tag == Tag.TYPEDEF:
                 elements.append(self.__parse_typedef(child))
             elif child.tag == Tag.ENUMERATION_TYPE:
@@ -123,10 +518,10 @@ class DwarfExtractor(Extractor):
 
     def __parse_compilation_unit(self, unit):
         top_die = unit.get_top_DIE()
-        return self.__parse_children(top_die)
+        return self.__parse_children(top_die, () if self.selection else None)
 
-    def __parse_namespace(self, die):
-        elements = self.__parse_children(die)
+    def __parse_namespace(self, die, scope=None):
+        elements = self.__parse_children(die, scope)
         namespace = Namespace(
             name=die.attributes[Attribute.NAME].value if Attribute.NAME in die.attributes else None,
             elements=elements,
@@ -136,20 +531,55 @@ class DwarfExtractor(Extractor):
         return namespace
 
     def __parse_typedef(self, die):
+        if self.selection:
+            self.__add_dependency(die)
+
         return TypeDef(
             name=die.attributes[Attribute.NAME].value,
             type=self.__resolve_type(die),
             decl_file=self.__get_file(die)
         )
 
+    def __parse_definition(self, die, parse):
+        key = self.__get_definition_key(die)
+        if key is None:
+            return parse(die)
+
+        fingerprint = self.walker.fingerprint(die)
+        definition = self._definitions.get(key)
+        if definition and definition.fingerprint == fingerprint:
+            self._aliases[die.offset] = definition
+            self.definitions_reused += 1
+            return definition.element
+
+        element = parse(die)
+        # A copy with more children carries implicitly declared members the stored one lacks
+        if not definition or len(fingerprint) > len(definition.fingerprint):
+            self._definitions[key] = Definition(element, fingerprint)
+
+        return element
+
+    def __get_definition_key(self, die):
+        attrs = die.attributes
+        decl_file = self.__get_file(die)
+        if Attribute.NAME not in attrs or not decl_file:
+            return None
+
+        namespaces = self.__get_namespaces(self.walker.get_parent(die))
+        byte_size = attrs[Attribute.BYTE_SIZE].value if Attribute.BYTE_SIZE in attrs else None
+        return die.tag, namespaces + (attrs[Attribute.NAME].value,), decl_file[1].path, byte_size
+
     def __parse_class_type(self, die):
         class_name = die.attributes[Attribute.NAME].value
         members = []
         inheritance_class = None
         inheritance_accessibility = None
 
-        for child in die.iter_children():
+        for child in self.walker.iter_children(die, MEMBER_CHILDREN):
             if child.tag == Tag.INHERITANCE:
+                if self.selection:
+                    self.__add_dependency(child)
+
                 inheritance_accessibility = self.__get_accessibility(child)
                 inheritance_class = self.__resolve_type(child)
                 continue
@@ -168,7 +598,7 @@ class DwarfExtractor(Extractor):
         class_name = die.attributes[Attribute.NAME].value
         members = []
 
-        for child in die.iter_children():
+        for child in self.walker.iter_children(die, MEMBER_CHILDREN):
             members.append(self.__parse_member(child))
 
         return Struct(
@@ -181,7 +611,7 @@ class DwarfExtractor(Extractor):
     def __parse_union_type(self, die):
         members = []
 
-        for child in die.iter_children():
+        for child in self.walker.iter_children(die, MEMBER_CHILDREN):
             members.append(self.__parse_member(child))
 
         return Union(
@@ -193,6 +623,8 @@ class DwarfExtractor(Extractor):
 
     def __parse_member(self, child):
         attrs = child.attributes
+        if self.selection and child.tag == Tag.MEMBER:
+            self.__add_dependency(child)
         accessibility = self.__get_accessibility(child)
         class_type = self.__resolve_type(child)
 
@@ -211,7 +643,7 @@ class DwarfExtractor(Extractor):
                 linkage_name=attrs[Attribute.LINKAGE_NAME].value if Attribute.LINKAGE_NAME in attrs else None,
             )
 
-            for sub_child in child.iter_children():
+            for sub_child in self.walker.iter_children(child, PARAMETER_CHILDREN):
                 if sub_child.tag == Tag.PARAMETER:
                     param_type = self.__resolve_type(sub_child)
                     method.direct_parameters.append(Parameter(  # TODO
@@ -220,11 +652,15 @@ class DwarfExtractor(Extractor):
                         offset=sub_child.offset
                     ))
 
+            # Symbols are read before units are walked only when elements are converted as they are extracted
+            if self.symbols and method.linkage_name:
+                method.low_pc = self.symbols.address(method.linkage_name)
+
             self._subprograms[child.offset] = method
             if method_name:
-                self._subprograms_name[method_name].add(method)
+                self._subprograms_name[method_name][method] = None
 
-            self._subprograms_incomplete.add(method)
+            self._subprograms_incomplete[method] = None
             return self._subprograms[child.offset]
         elif child.tag == Tag.MEMBER:
             if class_type:
@@ -255,7 +691,7 @@ class DwarfExtractor(Extractor):
         type_die = die.get_DIE_from_attribute(Attribute.TYPE)
         members = []
 
-        for child in type_die.iter_children():
+        for child in self.walker.iter_children(type_die, MEMBER_CHILDREN):
             member = self.__parse_member(child)
             if not member:
                 continue
@@ -275,7 +711,7 @@ class DwarfExtractor(Extractor):
         class_type = self.__resolve_type(die)
 
         enumerators = []
-        for child in die.iter_children():
+        for child in self.walker.iter_children(die, {Tag.ENUMERATOR}):
             child_name = child.attributes[Attribute.NAME].value
             child_value = child.attributes[Attribute.CONST_VALUE].value
             enumerators.append(Enumerator(name=child_name, value=child_value))
@@ -290,99 +726,180 @@ class DwarfExtractor(Extractor):
 
     def __parse_sub_program(self, die):
         if Attribute.SPECIFICATION not in die.attributes:
-            if not (Attribute.NAME not in die.attributes and Attribute.LINKAGE_NAME in die.attributes):
+            if self.selection or not (Attribute.NAME not in die.attributes and Attribute.LINKAGE_NAME in die.attributes):
                 return
 
             new_member = self.__parse_member(die)
-            match = re.match('_ZN[0-9]+([a-zA-z]+)C[0-9]', die.attributes[Attribute.LINKAGE_NAME].value.decode('utf-8'))
+            match = CONSTRUCTOR_NAME.match(die.attributes[Attribute.LINKAGE_NAME].value)
             if not match:
                 return
 
-            new_member.name = match.group(1).encode('utf-8')
-            self._subprograms_name[new_member.name].add(new_member)
+            new_member.name = match.group(1)
+            self._subprograms_name[new_member.name][new_member] = None
 
-            specification_die_offset = die.offset
+            specification_die = die
         else:
-            specification_die_offset = die.get_DIE_from_attribute(Attribute.SPECIFICATION).offset
-            if specification_die_offset not in self._subprograms:
-                self.__parse_member(die.get_DIE_from_attribute(Attribute.SPECIFICATION))
+            specification_die = die.get_DIE_from_attribute(Attribute.SPECIFICATION)
+            parent = self.walker.get_parent(specification_die)
+            if parent is not None and parent.tag in MEMBER_SCOPES and not self.__in_project(parent):
+                return
+
+            # Methods of classes which were not parsed yet are completed once dependencies are known
+            if self.selection and specification_die.offset not in self._subprograms and not self.__resolve_alias(specification_die):
+                self._skipped_definitions.append(die.offset)
+                return
 
-        existing_method = self._subprograms[specification_die_offset]
-        for child in die.iter_children():
+        parameters = []
+        for child in self.walker.iter_children(die, PARAMETER_CHILDREN):
             if child.tag == Tag.PARAMETER:
                 param_type = self.__resolve_type(child)
                 # if Attribute.NAME in child.attributes:  # Make sure
-                existing_method.parameters.append(Parameter(
+                parameters.append(Parameter(
                     name=child.attributes[Attribute.NAME].value if Attribute.NAME in child.attributes else b'arg',
                     type=param_type
                 ))
 
-        if Attribute.LOW_PC in die.attributes:
-            existing_method.low_pc = die.attributes[Attribute.LOW_PC].value
+        low_pc = die.attributes[Attribute.LOW_PC].value if Attribute.LOW_PC in die.attributes else None
 
-        if existing_method.low_pc:
-            existing_method.fully_defined = True
-            self._subprograms_incomplete.remove(existing_method)
+        # Declarations owned by another worker are completed after merging
+        if self._cu_offsets is not None and specification_die.cu.cu_offset not in self._cu_offsets:
+            self._pending_specifications.append((specification_die.offset, parameters, low_pc))
+            return
 
-    def __parse_files_info(self, dwarf_info, structs, offset=0):
-        files = {}
+        if specification_die.offset not in self._subprograms and not self.__resolve_alias(specification_die):
+            self.__parse_member(specification_die)
 
-        lineprog_header = struct_parse(structs.Dwarf_lineprog_header, dwarf_info.debug_line_sec.stream, offset)
-        for i, entry in enumerate(lineprog_header.file_entry):
-            files[i + 1] = File(id=i + 1, name=entry.name, directory=lineprog_header.include_directory[entry.dir_index - 1])
+        self.__complete_method(self._subprograms[specification_die.offset], parameters, low_pc)
 
-        return files
+    def __resolve_alias(self, specification_die):
+        """Maps declaration from an aliased copy of a class to the method of the shared definition"""
+        parent = self.walker.get_parent(specification_die)
+        definition = self._aliases.get(parent.offset) if parent else None
+        if not definition or Attribute.LINKAGE_NAME not in specification_die.attributes:
+            return False
 
-    def __resolve_type(self, die):
-        type = Type()
+        method = definition.method(specification_die.attributes[Attribute.LINKAGE_NAME].value)
+        if not method:
+            return False
+
+        self._subprograms[specification_die.offset] = method
+        return True
+
+    def __complete_method(self, method, parameters, low_pc):
+        # Inline methods are defined by every unit using them, parameters are taken once
+        if not method.parameters:
+            method.parameters = parameters
+
+        if low_pc is not None:
+            method.low_pc = low_pc
+
+        if method.low_pc:
+            method.fully_defined = True
+            self._subprograms_incomplete.pop(method, None)
+
+    def __parse_files_info(self, structs, offset, comp_dir):
+        if self._line_data is None:
+            self._line_data = section_data(self.dwarf_info.debug_line_sec)
+
+        # Only the file table is needed, which is read directly unless the line program has an unknown version
+        entries = read_file_entries(*self._line_data, offset, self.dwarf_info.config.little_endian)
+        if entries is None:
+            lineprog_header = struct_parse(structs.Dwarf_lineprog_header, self.dwarf_info.debug_line_sec.stream, offset)
+            entries = [(entry.name, lineprog_header.include_directory[entry.dir_index - 1]) for entry in lineprog_header.file_entry]
+
+        return {i + 1: self.file_table.intern(name, directory, comp_dir) for i, (name, directory) in enumerate(entries)}
 
+    def __resolve_type(self, die):
         if Attribute.TYPE not in die.attributes:
             return None
 
+        offset = self.__get_reference_offset(die.attributes[Attribute.TYPE], die.cu)
+        if offset is None:
+            return self.__build_type(die)
+
+        if offset in self._types:
+            self.type_cache_hits += 1
+            return self._types[offset]
+
+        self.type_cache_misses += 1
+        type = self._types[offset] = self.__build_type(die)
+        return type
+
+    def __build_type(self, die):
+        modifiers = []
+        array = False
+        array_size = None
+
         try:
             entry = die.get_DIE_from_attribute(Attribute.TYPE)
             while Attribute.NAME not in entry.attributes:
                 if entry.tag == Tag.POINTER_TYPE:
-                    type.modifiers.insert(0, TypeModifier.pointer)
+                    modifiers.append(TypeModifier.pointer)
 
                 if entry.tag == Tag.CONST_TYPE:
-                    type.modifiers.insert(0, TypeModifier.constant)
+                    modifiers.append(TypeModifier.constant)
 
                 if entry.tag == Tag.VOLATILE_TYPE:
-                    type.modifiers.insert(0, TypeModifier.volatile)
+                    modifiers.append(TypeModifier.volatile)
 
                 if entry.tag == Tag.REFERENCE_TYPE:
-                    type.modifiers.insert(0, TypeModifier.reference)
+                    modifiers.append(TypeModifier.reference)
 
                 if entry.tag == Tag.ARRAY_TYPE:
-                    type.array = True
-                    for array_child in entry.iter_children():
+                    array = True
+                    for array_child in self.walker.iter_children(entry, {Tag.SUBRANGE_TYPE}):
                         if array_child.tag == Tag.SUBRANGE_TYPE:
-                            type.array_size = array_child.attributes[Attribute.UPPER_BOUND].value + 1
+                            array_size = array_child.attributes[Attribute.UPPER_BOUND].value + 1
                             break
 
                 if Attribute.TYPE not in entry.attributes:
                     if Attribute.LINKAGE_NAME in entry.attributes:
-                        type.name = entry.attributes[Attribute.LINKAGE_NAME].value
-                        return type
+                        return Type(
+                            name=entry.attributes[Attribute.LINKAGE_NAME].value,
+                            modifiers=tuple(reversed(modifiers)),
+                            array=array,
+                            array_size=array_size
+                        )
                     return None
 
                 entry = entry.get_DIE_from_attribute(Attribute.TYPE)
 
-            type.name = entry.attributes[Attribute.NAME].value
-
-            if Attribute.DECL_FILE in entry.attributes:
-                type.decl_file = self.__get_file(entry)
-
-            entry = entry._parent
-            while entry and entry.tag == Tag.NAMESPACE:
-                type.namespaces.appendleft(entry.attributes[Attribute.NAME].value)
-                entry = entry._parent
+            return Type(
+                name=entry.attributes[Attribute.NAME].value,
+                namespaces=self.__get_namespaces(self.walker.get_parent(entry)),
+                modifiers=tuple(reversed(modifiers)),
+                decl_file=self.__get_file(entry),
+                array=array,
+                array_size=array_size
+            )
         except Exception as e:
             # print(e)
             return None
 
-        return type
+    def __get_namespaces(self, scope):
+        if not scope or scope.tag != Tag.NAMESPACE:
+            return ()
+
+        if scope.offset not in self._scopes:
+            self._scopes[scope.offset] = self.__get_namespaces(self.walker.get_parent(scope)) + (scope.attributes[Attribute.NAME].value,)
+
+        return self._scopes[scope.offset]
+
+    @staticmethod
+    def __get_scope_name(die):
+        if Attribute.NAME in die.attributes:
+            return die.attributes[Attribute.NAME].value.decode('utf-8', 'replace')
+
+        return '(anonymous namespace)' if die.tag == Tag.NAMESPACE else ''
+
+    @staticmethod
+    def __get_reference_offset(attribute, cu):
+        if attribute.form in ('DW_FORM_ref1', 'DW_FORM_ref2', 'DW_FORM_ref4', 'DW_FORM_ref8', 'DW_FORM_ref_udata'):
+            return cu.cu_offset + attribute.raw_value
+        if attribute.form == 'DW_FORM_ref_addr':
+            return attribute.raw_value
+
+        return None
 
     @staticmethod
     def __get_accessibility(die):
@@ -391,9 +908,22 @@ class DwarfExtractor(Extractor):
 
         return Accessibility.private.value
 
+    def __in_project(self, die):
+        decl_file = self.__get_file(die)
+        return decl_file is not None and decl_file[1].in_project
+
     def __get_file(self, die):
         if Attribute.DECL_FILE not in die.attributes:
             return None
 
         decl_file = die.attributes[Attribute.DECL_FILE].value
-        return die.cu.cu_offset, self.cu_files[die.cu.cu_offset][decl_file]
+        unit = self.unit_base + die.cu.cu_offset
+        files = self.cu_files.get(unit)
+        if files is None:
+            files = self.__parse_unit_files(die.cu)
+
+        return unit, files[decl_file]
+
+
+def _extract_shard(path, cu_offsets, sections_dir, scope):
+    return DwarfExtractor(sections_dir=sections_dir, scope=scope).extract_shard(path, cu_offsets)
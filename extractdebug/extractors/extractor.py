@@ -1,15 +1,39 @@
 import os
-from collections import deque
 from enum import Enum
 
+from extractdebug.stats import Stats
+
 
 class Extractor:
+    # Bumped whenever extracted results change, invalidates cached results
+    version = 0
+
+    def __init__(self, jobs=1, stats=None, selection=None, sections_dir=None, scope=None):
+        self.jobs = jobs
+        self.stats = stats or Stats()
+        # Only elements selected by qualified name are extracted if given
+        self.selection = selection
+        # Project files are narrowed by path patterns if given
+        self.scope = scope
+        # Decompressed debug sections are kept here for later runs if given
+        self.sections_dir = sections_dir
+
     def test(self, file):
+        """Checks if file is supported, anything opened here may be reused by extract"""
         raise NotImplementedError
 
     def extract(self, file):
         raise NotImplementedError
 
+    def iter_extract(self, file):
+        """Returns result and an iterator of batches of its elements, the result is complete once they are consumed
+
+        Batches are pairs of extracted elements and paths of files no later batch adds to,
+        the last batch has None in place of paths. By default everything is extracted at once.
+        """
+        result = self.extract(file)
+        return result, iter([(result.elements, None)])
+
 
 class ExtractorResult:
     def __init__(self, source_file, files, elements, base_dir):
@@ -23,6 +47,8 @@ class ExtractorResult:
 
 
 class Class:
+    __slots__ = ('name', 'members', 'inheritance_class', 'inheritance_accessibility', 'decl_file', 'parent')
+
     def __init__(self, **kwargs):
         self.name = kwargs.get('name', None)
         self.members = kwargs.get('members', None)
@@ -36,6 +62,8 @@ class Class:
 
 
 class Struct:
+    __slots__ = ('name', 'members', 'decl_file', 'parent')
+
     def __init__(self, **kwargs):
         self.name = kwargs.get('name', None)
         self.members = kwargs.get('members', None)
@@ -53,6 +81,8 @@ class Accessibility(Enum):
 
 
 class Field:
+    __slots__ = ('name', 'type', 'accessibility', 'static', 'const_value', 'parent', 'decl_file')
+
     def __init__(self, **kwargs):
         self.name = kwargs.get('name', None)
         self.type = kwargs.get('type', None)
@@ -67,30 +97,41 @@ class Field:
 
 
 class EnumerationType:
+    __slots__ = ('name', 'type', 'enumerators', 'decl_file', 'accessibility', 'static')
+
     def __init__(self, **kwargs):
         self.name = kwargs.get('name', None)
         self.type = kwargs.get('type', None)
         self.enumerators = kwargs.get('enumerators', None)
         self.decl_file = kwargs.get('decl_file', None)
         self.accessibility = kwargs.get('accessibility', Accessibility.private)
+        self.static = kwargs.get('static', False)
 
 
 class Enumerator:
+    __slots__ = ('name', 'value')
+
     def __init__(self, **kwargs):
         self.name = kwargs.get('name', None)
         self.value = kwargs.get('value', None)
 
 
 class Union:
+    __slots__ = ('name', 'fields', 'accessibility', 'decl_file', 'parent', 'static')
+
     def __init__(self, **kwargs):
         self.name = kwargs.get('name', None)
         self.fields = kwargs.get('fields', [])
         self.accessibility = kwargs.get('accessibility', Accessibility.private)
         self.decl_file = kwargs.get('decl_file', None)
         self.parent = kwargs.get('parent', None)
+        # Set on unions nested in other unions, the same way as on fields
+        self.static = kwargs.get('static', False)
 
 
 class Parameter:
+    __slots__ = ('name', 'type', 'offset')
+
     def __init__(self, **kwargs):
         self.name = kwargs.get('name', None)
         self.type = kwargs.get('type', None)
@@ -98,12 +139,15 @@ class Parameter:
 
 
 class Type:
+    __slots__ = ('name', 'namespaces', 'modifiers', 'decl_file', 'array', 'array_size', 'byte_size', 'base')
+
     def __init__(self, **kwargs):
         self.name = kwargs.get('name', None)
-        self.namespaces = kwargs.get('namespaces', deque())
-        self.modifiers = kwargs.get('modifiers', [])
+        self.namespaces = kwargs.get('namespaces', ())
+        self.modifiers = kwargs.get('modifiers', ())
         self.decl_file = kwargs.get('decl_file', None)
         self.array = kwargs.get('array', False)
+        self.array_size = kwargs.get('array_size', None)
         self.byte_size = kwargs.get('byte_size', False)
         self.base = kwargs.get('base', False)
 
@@ -116,6 +160,8 @@ class TypeModifier(Enum):
 
 
 class Method:
+    __slots__ = ('name', 'type', 'accessibility', 'static', 'virtual', 'parameters', 'direct_parameters', 'parent', 'low_pc', 'offset', 'decl_file', 'fully_defined', 'linkage_name')
+
     def __init__(self, **kwargs):
         self.name = kwargs.get('name', None)
         self.type = kwargs.get('type', None)
@@ -136,6 +182,8 @@ class Method:
 
 
 class Namespace:
+    __slots__ = ('name', 'elements', 'decl_file', 'parent')
+
     def __init__(self, **kwargs):
         self.name = kwargs.get('name', None)
         self.elements = kwargs.get('elements', [])
@@ -144,6 +192,8 @@ class Namespace:
 
 
 class TypeDef:
+    __slots__ = ('name', 'type', 'decl_file', 'parent')
+
     def __init__(self, **kwargs):
         self.name = kwargs.get('name', None)
         self.type = kwargs.get('type', None)
@@ -152,13 +202,56 @@ class TypeDef:
 
 
 class File:
+    __slots__ = ('id', 'name', 'directory', 'path', 'in_project')
+
     def __init__(self, **kwargs):
         self.id = kwargs.get('id', 0)
         self.name = kwargs.get('name', None)
         self.directory = kwargs.get('directory', None)
-
-    def full_path(self):
-        return os.path.abspath(os.path.join(self.directory, self.name))
+        # Normalized absolute path and whether it lies in the project directory, computed once by FileTable
+        self.path = kwargs.get('path', None)
+        self.in_project = kwargs.get('in_project', False)
 
     def __repr__(self):
         return f'File{{id={self.id}, name={self.name}, directory={self.directory}'
+
+
+class FileTable:
+    """Files interned by normalized absolute path, ids are assigned in the order files are first seen
+
+    Files in the base directory are project files, unless they are left out by scope.
+    """
+    def __init__(self, base_dir=b'/', scope=None):
+        self.base_dir = base_dir
+        self.scope = scope
+        self.files = {}
+
+    def intern(self, name, directory, comp_dir=b''):
+        """Returns the file name in directory, relative directories are relative to comp_dir"""
+        path = os.path.abspath(os.path.join(comp_dir or b'', directory, name))
+        file = self.files.get(path)
+        if file is None:
+            file = self.files[path] = File(
+                id=len(self.files),
+                name=name,
+                directory=directory,
+                path=path,
+                in_project=self.__in_project(name, path)
+            )
+
+        return file
+
+    def __in_project(self, name, path):
+        if name == b'<built-in>' or not path.startswith(self.base_dir):
+            return False
+
+        return self.scope is None or self.scope.includes(os.path.relpath(path, self.base_dir))
+
+    def adopt(self, file):
+        """Interns file created by another table, e.g. of a worker process, giving it the id of the same file in this one"""
+        interned = self.files.get(file.path)
+        if interned is None:
+            file.id = len(self.files)
+            self.files[file.path] = file
+        else:
+            file.id = interned.id
@@ -0,0 +1,57 @@
+import struct
+
+
+def read_file_entries(data, base, offset, little_endian=True):
+    """Returns (name, directory) pairs of the file table of a version 2 to 4 line program, None for other versions
+
+    Only the header is read, directories are looked up the way they are indexed by file entries.
+    """
+    byteorder = '<' if little_endian else '>'
+    position = base + offset
+    unit_length = struct.unpack_from(byteorder + 'I', data, position)[0]
+    position += 4
+    offset_size = 4
+    if unit_length == 0xffffffff:
+        position += 8
+        offset_size = 8
+
+    version = struct.unpack_from(byteorder + 'H', data, position)[0]
+    if not 2 <= version <= 4:
+        return None
+
+    # Header length is followed by instruction lengths, is_stmt, line base and range, and opcode lengths
+    position += 2 + offset_size
+    position += 5 if version >= 4 else 4
+    opcode_base = data[position]
+    position += opcode_base
+
+    directories = []
+    while data[position]:
+        end = data.find(b'\0', position)
+        directories.append(bytes(data[position:end]))
+        position = end + 1
+    position += 1
+
+    entries = []
+    while data[position]:
+        end = data.find(b'\0', position)
+        name = bytes(data[position:end])
+        position = end + 1
+        dir_index, position = read_uleb128(data, position)
+        # Modification time and length are not used
+        _, position = read_uleb128(data, position)
+        _, position = read_uleb128(data, position)
+        entries.append((name, directories[dir_index - 1]))
+
+    return entries
+
+
+def read_uleb128(data, position):
+    value = shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
@@ -0,0 +1,191 @@
+import hashlib
+import mmap
+import os
+import tempfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from elftools.common.exceptions import ELFCompressionError
+from elftools.dwarf.dwarfinfo import DebugSectionDescriptor, DWARFInfo, DwarfConfig
+
+DWARF_SECTIONS = ('.debug_info', '.debug_aranges', '.debug_abbrev', '.debug_frame', '.eh_frame', '.debug_str',
+                  '.debug_loc', '.debug_ranges', '.debug_line', '.debug_pubtypes', '.debug_pubnames')
+
+
+class MemoryViewStream:
+    """Seekable read-only stream over a memoryview, used in place of the BytesIO copies made by pyelftools"""
+    def __init__(self, view):
+        self.view = view
+        self.position = 0
+
+    def read(self, size=-1):
+        start = self.position
+        end = len(self.view) if size is None or size < 0 else min(start + size, len(self.view))
+        self.position = end
+        return self.view[start:end].tobytes()
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self.position
+        elif whence == 2:
+            offset += len(self.view)
+
+        self.position = offset
+        return offset
+
+    def tell(self):
+        return self.position
+
+
+def section_data(section):
+    """Returns buffer holding section contents and offset of the section in it, without copying"""
+    stream = section.stream
+    if isinstance(stream, MemoryViewStream):
+        return stream.view.obj, section.global_offset
+
+    return stream.getvalue(), 0
+
+
+def map_file(file):
+    """Maps the whole file read-only, returns None for streams without a file descriptor"""
+    try:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def get_dwarf_info(elf_file, mapping, sections_dir=None):
+    """Builds DWARFInfo serving sections as zero-copy slices of the mapping when possible
+
+    Compressed sections are inflated once in parallel threads, with sections_dir they are kept there as files
+    named after the checksum of compressed data and mapped by later runs and worker processes.
+    """
+    if not mapping or not can_map_sections(elf_file):
+        return elf_file.get_dwarf_info()
+
+    view = memoryview(mapping)
+    sections = {}
+    compressed = {}
+    for name in DWARF_SECTIONS:
+        section = find_section(elf_file, name)
+        if section is None:
+            sections[name] = None
+        elif is_compressed(section):
+            compressed[name] = section
+        else:
+            offset, size = section['sh_offset'], section['sh_size']
+            sections[name] = DebugSectionDescriptor(
+                stream=MemoryViewStream(view[offset:offset + size]),
+                name=name,
+                global_offset=offset,
+                size=size,
+                address=section['sh_addr']
+            )
+
+    if compressed:
+        # zlib releases the GIL while inflating
+        with ThreadPoolExecutor(max_workers=len(compressed)) as executor:
+            inflated = executor.map(lambda section: inflate_section(elf_file, view, section, sections_dir), compressed.values())
+            for (name, section), data in zip(compressed.items(), inflated):
+                sections[name] = DebugSectionDescriptor(
+                    stream=MemoryViewStream(memoryview(data)),
+                    name=name,
+                    global_offset=0,
+                    size=len(data),
+                    address=section['sh_addr']
+                )
+
+    return DWARFInfo(
+        config=DwarfConfig(
+            little_endian=elf_file.little_endian,
+            default_address_size=elf_file.elfclass // 8,
+            machine_arch=elf_file.get_machine_arch()
+        ),
+        debug_info_sec=sections['.debug_info'],
+        debug_aranges_sec=sections['.debug_aranges'],
+        debug_abbrev_sec=sections['.debug_abbrev'],
+        debug_frame_sec=sections['.debug_frame'],
+        eh_frame_sec=sections['.eh_frame'],
+        debug_str_sec=sections['.debug_str'],
+        debug_loc_sec=sections['.debug_loc'],
+        debug_ranges_sec=sections['.debug_ranges'],
+        debug_line_sec=sections['.debug_line'],
+        debug_pubtypes_sec=sections['.debug_pubtypes'],
+        debug_pubnames_sec=sections['.debug_pubnames']
+    )
+
+
+def can_map_sections(elf_file):
+    # Relocatable objects need relocations applied to a private copy
+    if elf_file['e_type'] == 'ET_REL':
+        return False
+
+    for name in DWARF_SECTIONS:
+        section = find_section(elf_file, name)
+        if section is not None and section['sh_type'] == 'SHT_NOBITS':
+            return False
+
+    return True
+
+
+def find_section(elf_file, name):
+    """Returns section of the given name, or its .zdebug_ counterpart written by older toolchains"""
+    section = elf_file.get_section_by_name(name)
+    if section is None and name.startswith('.debug_'):
+        section = elf_file.get_section_by_name('.z' + name[1:])
+
+    return section
+
+
+def is_compressed(section):
+    return section.compressed or section.name.startswith('.zdebug_')
+
+
+def inflate_section(elf_file, view, section, sections_dir=None):
+    """Returns decompressed contents of a SHF_COMPRESSED or .zdebug_ section, reusing the copy in sections_dir"""
+    offset, size = section['sh_offset'], section['sh_size']
+    data = view[offset:offset + size]
+    if section.name.startswith('.zdebug_'):
+        # ZLIB magic followed by big endian size of decompressed data
+        data = data[12:]
+    else:
+        header_size = elf_file.structs.Elf_Chdr.sizeof()
+        compression_type = elf_file.structs.Elf_Chdr.parse(data[:header_size].tobytes())['ch_type']
+        if compression_type != 'ELFCOMPRESS_ZLIB':
+            raise ELFCompressionError(f'Unknown compression type: {compression_type}')
+        data = data[header_size:]
+
+    if not sections_dir:
+        return zlib.decompress(data)
+
+    path = os.path.join(sections_dir, f'{hashlib.sha256(data).hexdigest()}.section')
+    try:
+        with open(path, 'rb') as file:
+            inflated = map_file(file)
+    except FileNotFoundError:
+        inflated = None
+    if inflated is not None:
+        # Access time drives eviction together with cached results, read-only cache directories only lose the LRU order
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return inflated
+
+    inflated = zlib.decompress(data)
+    try:
+        os.makedirs(sections_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=sections_dir, suffix='.tmp')
+    except OSError:
+        # Sections are kept only where the cache directory is writable
+        return inflated
+
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(inflated)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+    return inflated
@@ -0,0 +1,23 @@
+import hashlib
+from fnmatch import fnmatchcase
+
+
+class ProjectScope:
+    """Narrows project files in the base directory to paths matching include patterns and none of exclude patterns
+
+    Patterns are matched with fnmatch against paths relative to the base directory, * matches / as well.
+    """
+    def __init__(self, include=(), exclude=()):
+        self.include = [pattern.encode('utf-8') for pattern in include]
+        self.exclude = [pattern.encode('utf-8') for pattern in exclude]
+
+    def includes(self, relative_path):
+        if self.include and not any(fnmatchcase(relative_path, pattern) for pattern in self.include):
+            return False
+
+        return not any(fnmatchcase(relative_path, pattern) for pattern in self.exclude)
+
+    def key(self):
+        """Short digest of the patterns, results extracted with other ones differ"""
+        digest = hashlib.sha256(repr((self.include, self.exclude)).encode('utf-8'))
+        return digest.hexdigest()[:16]
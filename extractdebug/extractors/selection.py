@@ -0,0 +1,42 @@
+from fnmatch import fnmatchcase
+
+
+def split_qualified(name):
+    """Splits a qualified name on ::, separators inside template arguments are kept"""
+    parts = []
+    depth = start = 0
+    i = 0
+    while i < len(name):
+        if name[i] == '<':
+            depth += 1
+        elif name[i] == '>':
+            depth -= 1
+        elif depth == 0 and name.startswith('::', i):
+            parts.append(name[start:i])
+            start = i + 2
+            i += 1
+        i += 1
+
+    parts.append(name[start:])
+    return tuple(parts)
+
+
+class Selection:
+    """Qualified names of elements to extract, every :: separated component of a pattern is matched with fnmatch
+
+    A pattern naming a namespace selects everything declared in it, for example geo, geo::Shape or geo::*.
+    """
+    def __init__(self, patterns):
+        self.patterns = [split_qualified(pattern[2:] if pattern.startswith('::') else pattern) for pattern in patterns]
+
+    def includes(self, path):
+        """Checks if element with qualified name path, given as a tuple of components, or one of its scopes is selected"""
+        return any(len(pattern) <= len(path) and self.__matches(path, pattern) for pattern in self.patterns)
+
+    def may_contain(self, path):
+        """Checks if scope path may contain selected elements"""
+        return any(len(pattern) > len(path) and self.__matches(path, pattern) for pattern in self.patterns)
+
+    @staticmethod
+    def __matches(path, pattern):
+        return all(fnmatchcase(component, pattern_component) for component, pattern_component in zip(path, pattern))
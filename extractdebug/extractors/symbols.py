@@ -0,0 +1,62 @@
+import re
+import struct
+
+# Unified constructor and destructor names used by declarations, symbols carry the concrete variants
+UNIFIED_STRUCTOR = re.compile(rb'([CD])4E')
+STRUCTOR_VARIANTS = {b'C': (b'C1E', b'C2E'), b'D': (b'D1E', b'D2E', b'D0E')}
+
+STT_FUNC = 2
+STT_GNU_IFUNC = 10
+SHN_UNDEF = 0
+
+
+class SymbolIndex:
+    """Addresses of functions defined by an ELF file keyed by their mangled names, read from .symtab and .dynsym"""
+    def __init__(self, elf_file):
+        self.addresses = {}
+
+        # Entries of .symtab take precedence, .dynsym is all that is left in stripped binaries
+        for name in ('.symtab', '.dynsym'):
+            section = elf_file.get_section_by_name(name)
+            if section is None or section['sh_type'] == 'SHT_NOBITS':
+                continue
+
+            strings = elf_file.get_section(section['sh_link']).data()
+            for name_offset, info, section_index, value in self.__iter_symbols(elf_file, section.data()):
+                if info & 0xf not in (STT_FUNC, STT_GNU_IFUNC) or section_index == SHN_UNDEF or not value:
+                    continue
+
+                symbol_name = strings[name_offset:strings.index(b'\0', name_offset)]
+                self.addresses.setdefault(symbol_name, value)
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def address(self, linkage_name):
+        """Returns address of the function with linkage_name, or None if it is not defined"""
+        address = self.addresses.get(linkage_name)
+        if address is not None:
+            return address
+
+        match = UNIFIED_STRUCTOR.search(linkage_name)
+        if not match:
+            return None
+
+        # Complete object variants are preferred, they are what callers constructing an object use
+        for variant in STRUCTOR_VARIANTS[match.group(1)]:
+            address = self.addresses.get(linkage_name[:match.start()] + variant + linkage_name[match.end():])
+            if address is not None:
+                return address
+
+        return None
+
+    @staticmethod
+    def __iter_symbols(elf_file, data):
+        """Yields name offset, info, section index and value of symbols, unpacked without construct"""
+        byteorder = '<' if elf_file.little_endian else '>'
+        if elf_file.elfclass == 64:
+            for name_offset, info, _, section_index, value, _ in struct.iter_unpack(f'{byteorder}IBBHQQ', data):
+                yield name_offset, info, section_index, value
+        else:
+            for name_offset, value, _, info, _, section_index in struct.iter_unpack(f'{byteorder}IIIBBH', data):
+                yield name_offset, info, section_index, value
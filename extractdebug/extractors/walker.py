@@ -0,0 +1,347 @@
+from bisect import bisect_right
+from collections import defaultdict
+
+from elftools.common.utils import struct_parse
+from elftools.dwarf.die import DIE, AttributeValue
+from elftools.dwarf.enums import DW_FORM_raw2name
+
+from extractdebug.extractors.mapped import section_data
+
+# Variable size forms decoded directly from section data, fixed size forms are always decoded directly
+DIRECT_FORMS = ('DW_FORM_flag_present', 'DW_FORM_udata', 'DW_FORM_ref_udata', 'DW_FORM_sdata', 'DW_FORM_string')
+
+
+class AbbrevPlan:
+    """Abbreviation declaration reduced to what is needed to decode or skip entries using it"""
+    def __init__(self, decl, sizes):
+        self.tag = decl['tag']
+        self.has_children = decl.has_children()
+        self.specs = list(decl.iter_attr_specs())
+        self.sibling_index = next((i for i, (name, _) in enumerate(self.specs) if name == 'DW_AT_sibling'), None)
+
+        # Sum of attribute sizes when all of them have fixed size
+        fixed_sizes = [sizes.get(form) for _, form in self.specs]
+        self.fixed_size = None if None in fixed_sizes else sum(fixed_sizes)
+
+
+class LeanDIE(DIE):
+    """DIE decoding only selected attributes, remaining ones are skipped over"""
+    def __init__(self, cu, stream, offset, walker):
+        self.walker = walker
+        super().__init__(cu, stream, offset)
+
+    def _parse_DIE(self):
+        self.walker.parse(self)
+
+
+class DIEWalker:
+    """Walks DIE children using abbreviations to skip subtrees with uninteresting tags without decoding them"""
+    def __init__(self, dwarf_info, attributes):
+        self.dwarf_info = dwarf_info
+        # Offsets used by the walker are relative to the section, data is indexed with base added
+        self.data, self.base = section_data(dwarf_info.debug_info_sec)
+        self.attributes = frozenset(attributes)
+        self.string_data = section_data(dwarf_info.debug_str_sec) if dwarf_info.debug_str_sec else (b'', 0)
+        self.strings = {}
+        self.plans = {}
+        self.unit_plans = {}
+        self.byteorder = 'little' if dwarf_info.config.little_endian else 'big'
+        self.sizes = {}
+        # Parents of DIEs which were skipped, used to resolve scopes of referenced types
+        self.parents = {}
+        # DIEs decoded, DIEs skipped and bytes skipped per CU offset
+        self.units = defaultdict(lambda: [0, 0, 0])
+
+    def iter_children(self, die, tags):
+        """Yields children of die with tag in tags, other children and their subtrees are skipped"""
+        if not die.has_children:
+            return
+
+        cu = die.cu
+        counters = self.units[cu.cu_offset]
+        offset = die.offset + die.size
+        while True:
+            code, attributes_offset = self.__read_uleb(offset)
+            if code == 0:
+                return
+
+            plan = self.__plan(cu, code)
+            if plan.tag in tags:
+                child = self.__get_DIE(cu, offset)
+                child.set_parent(die)
+                yield child
+
+                sibling = child.attributes.get('DW_AT_sibling')
+                if sibling:
+                    offset = cu.cu_offset + sibling.raw_value
+                else:
+                    end = child.offset + child.size
+                    offset = self.__skip_children(cu, end) if plan.has_children else end
+            else:
+                self.parents[offset] = die
+                counters[1] += 1
+                end, sibling = self.__skip_attributes(cu, plan, attributes_offset)
+                if sibling is None:
+                    sibling = self.__skip_children(cu, end) if plan.has_children else end
+
+                counters[2] += sibling - offset
+                offset = sibling
+
+    def get_parent(self, die):
+        """Returns parent of die, ancestors' children are scanned without decoding them"""
+        if die._parent is not None:
+            return die._parent
+        if die.offset in self.parents:
+            return self.parents[die.offset]
+
+        search = die.cu.get_top_DIE()
+        while search.offset < die.offset:
+            ancestor = None
+            for offset, _, end in self.__iter_child_offsets(search):
+                self.parents[offset] = search
+                if die.offset < end:
+                    ancestor = offset
+                    break
+
+            if ancestor is None:
+                return None
+            if ancestor == die.offset:
+                return search
+
+            search = self.__get_DIE(die.cu, ancestor)
+
+        return None
+
+    def release(self):
+        """Drops all decoded DIEs and cached units, units referenced later are parsed again"""
+        for cu in self.dwarf_info._cu_cache:
+            cu._dielist = []
+            cu._diemap = []
+
+        self.dwarf_info._cu_cache = []
+        self.dwarf_info._cu_offsets_map = []
+        self.parents.clear()
+
+    def fingerprint(self, die):
+        """Tags and encoded sizes of die's children, read from abbreviations without decoding the children"""
+        return tuple((plan.tag, end - offset) for offset, plan, end in self.__iter_child_offsets(die))
+
+    def parse(self, die):
+        """Decodes die in place of DIE._parse_DIE"""
+        cu = die.cu
+        self.units[cu.cu_offset][0] += 1
+
+        die.abbrev_code, offset = self.__read_uleb(die.offset)
+        if die.abbrev_code == 0:
+            die.size = offset - die.offset
+            return
+
+        plan = self.__plan(cu, die.abbrev_code)
+        die.tag = plan.tag
+        die.has_children = plan.has_children
+
+        sizes = self.__sizes(cu)
+        for name, form in plan.specs:
+            if name not in self.attributes:
+                offset = self.__skip_form(form, offset, sizes)
+                continue
+
+            if form in sizes or form in DIRECT_FORMS:
+                raw_value, value, end = self.__decode_form(form, offset, sizes)
+            else:
+                raw_value = struct_parse(cu.structs.Dwarf_dw_form[form], die.stream, offset)
+                value = die._translate_attr_value(form, raw_value)
+                end = die.stream.tell()
+
+            die.attributes[name] = AttributeValue(
+                name=name,
+                form=form,
+                value=value,
+                raw_value=raw_value,
+                offset=offset
+            )
+            offset = end
+
+        die.size = offset - die.offset
+
+    def __get_DIE(self, cu, offset):
+        # Shares the pyelftools DIE cache, so that references resolve to the same objects
+        i = bisect_right(cu._diemap, offset)
+        if cu._diemap[i - 1] == offset:
+            return cu._dielist[i - 1]
+
+        die = LeanDIE(cu, self.dwarf_info.debug_info_sec.stream, offset, self)
+        cu._dielist.insert(i, die)
+        cu._diemap.insert(i, offset)
+        return die
+
+    def __iter_child_offsets(self, die):
+        if not die.has_children:
+            return
+
+        cu = die.cu
+        offset = die.offset + die.size
+        while True:
+            code, attributes_offset = self.__read_uleb(offset)
+            if code == 0:
+                return
+
+            plan = self.__plan(cu, code)
+            end, sibling = self.__skip_attributes(cu, plan, attributes_offset)
+            if sibling is None:
+                sibling = self.__skip_children(cu, end) if plan.has_children else end
+
+            yield offset, plan, sibling
+            offset = sibling
+
+    def __skip_children(self, cu, offset):
+        counters = self.units[cu.cu_offset]
+        depth = 1
+        while depth:
+            code, offset = self.__read_uleb(offset)
+            if code == 0:
+                depth -= 1
+                continue
+
+            counters[1] += 1
+            plan = self.__plan(cu, code)
+            offset, sibling = self.__skip_attributes(cu, plan, offset)
+            if sibling is not None:
+                offset = sibling
+            elif plan.has_children:
+                depth += 1
+
+        return offset
+
+    def __skip_attributes(self, cu, plan, offset):
+        """Returns offset after attributes and absolute sibling offset if known"""
+        if plan.fixed_size is not None and plan.sibling_index is None:
+            return offset + plan.fixed_size, None
+
+        sizes = self.__sizes(cu)
+        sibling = None
+        for i, (_, form) in enumerate(plan.specs):
+            if i == plan.sibling_index:
+                sibling = cu.cu_offset + self.__read_form(form, offset, sizes)
+
+            offset = self.__skip_form(form, offset, sizes)
+
+        return offset, sibling
+
+    def __skip_form(self, form, offset, sizes):
+        size = sizes.get(form)
+        if size is not None:
+            return offset + size
+
+        if form in ('DW_FORM_udata', 'DW_FORM_sdata', 'DW_FORM_ref_udata'):
+            return self.__read_uleb(offset)[1]
+        if form == 'DW_FORM_string':
+            return self.data.find(b'\0', self.base + offset) - self.base + 1
+        if form in ('DW_FORM_block1', 'DW_FORM_block2', 'DW_FORM_block4'):
+            length_size = {'DW_FORM_block1': 1, 'DW_FORM_block2': 2, 'DW_FORM_block4': 4}[form]
+            return offset + length_size + self.__read_uint(offset, length_size)
+        if form in ('DW_FORM_block', 'DW_FORM_exprloc'):
+            length, offset = self.__read_uleb(offset)
+            return offset + length
+        if form == 'DW_FORM_indirect':
+            code, offset = self.__read_uleb(offset)
+            return self.__skip_form(DW_FORM_raw2name[code], offset, sizes)
+
+        raise ValueError(f'Unsupported attribute form {form}')
+
+    def __decode_form(self, form, offset, sizes):
+        """Decodes value of form without construct, returns raw value, translated value and end offset"""
+        if form == 'DW_FORM_flag_present':
+            return 0, True, offset
+        if form in ('DW_FORM_udata', 'DW_FORM_ref_udata'):
+            value, end = self.__read_uleb(offset)
+            return value, value, end
+        if form == 'DW_FORM_sdata':
+            value, end = self.__read_sleb(offset)
+            return value, value, end
+        if form == 'DW_FORM_string':
+            start = self.base + offset
+            end = self.data.find(b'\0', start)
+            value = self.data[start:end]
+            return value, value, end - self.base + 1
+
+        size = sizes[form]
+        raw_value = self.__read_uint(offset, size)
+        if form == 'DW_FORM_strp':
+            return raw_value, self.__get_string(raw_value), offset + size
+        if form == 'DW_FORM_flag':
+            return raw_value, raw_value != 0, offset + size
+
+        return raw_value, raw_value, offset + size
+
+    def __get_string(self, offset):
+        value = self.strings.get(offset)
+        if value is None:
+            data, base = self.string_data
+            start = base + offset
+            value = self.strings[offset] = data[start:data.find(b'\0', start)]
+
+        return value
+
+    def __read_form(self, form, offset, sizes):
+        if form == 'DW_FORM_ref_udata':
+            return self.__read_uleb(offset)[0]
+
+        return self.__read_uint(offset, sizes[form])
+
+    def __read_uint(self, offset, size):
+        start = self.base + offset
+        return int.from_bytes(self.data[start:start + size], self.byteorder)
+
+    def __read_sleb(self, offset):
+        value, end = self.__read_uleb(offset)
+        bits = 7 * (end - offset)
+        if value & (1 << (bits - 1)):
+            value -= 1 << bits
+
+        return value, end
+
+    def __read_uleb(self, offset):
+        data = self.data
+        position = self.base + offset
+        result = shift = 0
+        while True:
+            byte = data[position]
+            position += 1
+            result |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return result, position - self.base
+            shift += 7
+
+    def __plan(self, cu, code):
+        plans = self.unit_plans.get(cu.cu_offset)
+        if plans is None:
+            # Units sharing an abbreviation table share their plans
+            plans = self.unit_plans[cu.cu_offset] = self.plans.setdefault(cu['debug_abbrev_offset'], {})
+
+        plan = plans.get(code)
+        if plan is None:
+            plan = plans[code] = AbbrevPlan(cu.get_abbrev_table().get_abbrev(code), self.__sizes(cu))
+
+        return plan
+
+    def __sizes(self, cu):
+        """Sizes of fixed size forms, they depend on address size, DWARF format and version of the CU"""
+        structs = cu.structs
+        key = (structs.address_size, structs.dwarf_format, structs.dwarf_version)
+        sizes = self.sizes.get(key)
+        if sizes is None:
+            offset_size = 4 if structs.dwarf_format == 32 else 8
+            sizes = self.sizes[key] = {
+                'DW_FORM_addr': structs.address_size,
+                'DW_FORM_data1': 1, 'DW_FORM_ref1': 1, 'DW_FORM_flag': 1,
+                'DW_FORM_data2': 2, 'DW_FORM_ref2': 2,
+                'DW_FORM_data4': 4, 'DW_FORM_ref4': 4, 'DW_FORM_ref': 4,
+                'DW_FORM_data8': 8, 'DW_FORM_ref8': 8, 'DW_FORM_ref_sig8': 8,
+                'DW_FORM_flag_present': 0,
+                'DW_FORM_ref_addr': structs.address_size if structs.dwarf_version == 2 else offset_size,
+                'DW_FORM_strp': offset_size, 'DW_FORM_sec_offset': offset_size,
+                'DW_FORM_GNU_strp_alt': offset_size, 'DW_FORM_GNU_ref_alt': offset_size,
+            }
+
+        return sizes
@@ -0,0 +1,46 @@
+import os
+
+import click
+
+from extractdebug.cache import default_cache_dir
+
+OPTIONS = [
+    click.option('--format', 'formats', type=click.Choice(['cpp', 'pointers_cpp'], case_sensitive=False), multiple=True, default=['cpp'],
+                 help='Output format, repeat to write several formats from one extraction, each into its own subdirectory.'),
+    click.option('--includes/--no-includes', default=True),
+    click.option('--output-dir', type=click.Path(file_okay=False), default='output', help='Directory generated headers are written to.'),
+    click.option('--incremental/--no-incremental', default=False,
+                 help='Write only headers whose content changed and remove headers generated before which are gone.'),
+    click.option('--pointers-table/--no-pointers-table', default=False, help='List method addresses of pointers_cpp classes in one table sorted by address.'),
+    click.option('--jobs', type=click.IntRange(min=1), default=1,
+                 help='Number of worker processes parsing compilation units, in batch mode each processing one binary at a time.'),
+    click.option('--cache/--no-cache', default=True, help='Reuse extraction results of previously processed binaries.'),
+    click.option('--cache-dir', type=click.Path(file_okay=False), default=default_cache_dir),
+    click.option('--cache-size', type=click.IntRange(min=0), default=1024, help='Cache size limit in megabytes.'),
+    click.option('--only', multiple=True, help='Extract only elements with qualified name matching the pattern, e.g. geo::Shape or geo::*.'),
+    click.option('--include-path', multiple=True, help='Extract only elements declared in project files matching the pattern, e.g. src/*.'),
+    click.option('--exclude-path', multiple=True, help='Skip elements declared in project files matching the pattern, e.g. */third_party/*.')
+]
+
+
+def extraction_options(command):
+    """Adds options shared by extract.py and batch.py to a click command"""
+    for option in reversed(OPTIONS):
+        command = option(command)
+
+    return command
+
+
+def create_config(includes, output_dir, incremental, pointers_table, only):
+    return {
+        'includes': includes,
+        'output_dir': output_dir,
+        'incremental': incremental,
+        # Headers missing from a partial extraction are not stale
+        'remove_stale': not only,
+        'pointers_table': pointers_table
+    }
+
+
+def default_jobs():
+    return os.cpu_count() or 1
@@ -1,27 +1,150 @@
+import os
+
 from extractdebug.converters import all_converters
-from extractdebug.extractors import all_extractors
+from extractdebug.extractors import iter_extractors, PROBE_SIZE
+from extractdebug.extractors.mapped import MemoryViewStream
+from extractdebug.stats import Stats
+
+
+def process(file, jobs=1, cache=None, stats=None, selection=None, scope=None):
+    """Extracts file, which is a binary file object or a buffer holding the contents of one"""
+    stats = stats or Stats()
+    file = as_stream(file)
+    header = read_header(file)
+    # Cached results are complete, partial ones are cheap to extract again
+    if selection:
+        cache = None
 
+    result = load_cached(file, header, cache, stats, scope)
+    if result:
+        return result
 
-def process(file):
-    extractor_class = find_extractor(file)
-    if not extractor_class:
+    with stats.phase('open'):
+        extractor = find_extractor(file, header, jobs, stats, selection, sections_dir(cache), scope)
+    if not extractor:
         return None
 
-    extractor = extractor_class()
-    return extractor.extract(file)
+    result = extractor.extract(file)
+    store_cached(file, extractor, result, cache, stats, scope)
+
+    return result
+
+
+def process_pipeline(file, formats, config, stream=None, jobs=1, cache=None, stats=None, selection=None, scope=None):
+    """Extracts and converts file together, files are written as soon as no later compilation unit adds to them"""
+    stats = stats or Stats()
+    file = as_stream(file)
+    header = read_header(file)
+    if selection:
+        cache = None
+
+    result = load_cached(file, header, cache, stats, scope)
+    if result:
+        convert(result, formats, config, stream, stats)
+        return result
+
+    with stats.phase('open'):
+        extractor = find_extractor(file, header, jobs, stats, selection, sections_dir(cache), scope)
+    if not extractor:
+        return None
+
+    result, batches = extractor.iter_extract(file)
+    groups = group_converters(create_converters(result, formats, config, stats))
+    # Batches are consumed by the first group, other groups convert the complete result afterwards
+    if groups:
+        converter, writers = groups[0]
+        converter.convert_batches(batches, stream, writers)
+    for converter, writers in groups[1:]:
+        converter.convert(stream, writers)
+
+    store_cached(file, extractor, result, cache, stats, scope)
+
+    return result
+
+
+def convert(result, formats, config, stream=None, stats=None):
+    """Converts result to every format, elements are converted once for converters sharing the conversion"""
+    for converter, writers in group_converters(create_converters(result, formats, config, stats)):
+        converter.convert(stream, writers)
+
+
+def create_converters(result, formats, config, stats=None):
+    """Returns converters of known formats, each format is written to its own directory when there are more of them"""
+    converters = []
+    formats = list(dict.fromkeys(formats))
+    for format in formats:
+        converter = find_converter(format)
+        if not converter:
+            continue
+
+        format_config = config
+        if len(formats) > 1:
+            format_config = dict(config, output_dir=os.path.join(config.get('output_dir', 'output'), format))
 
+        converters.append(converter(result, format_config, stats=stats))
 
-def convert(result, format, config):
-    converter = find_converter(format)
-    if not converter:
+    return converters
+
+
+def group_converters(converters):
+    """Groups converters as pairs of a converter and converters writing its converted elements"""
+    groups = []
+    for converter in converters:
+        group = next((group for group in groups if group[0].shares_conversion(converter)), None)
+        if group:
+            group[1].append(converter)
+        else:
+            groups.append((converter, []))
+
+    return groups
+
+
+def load_cached(file, header, cache, stats, scope=None):
+    if not cache:
         return None
 
-    return converter(result, config).convert()
+    with stats.phase('cache_load'):
+        result = cache.load(file, iter_extractors(header), scope.key() if scope else None)
+    if result:
+        stats.count('cache_hits')
+
+    return result
+
+
+def store_cached(file, extractor, result, cache, stats, scope=None):
+    if cache:
+        with stats.phase('cache_store'):
+            cache.store(file, type(extractor), result, scope.key() if scope else None)
+
+
+def sections_dir(cache):
+    # Decompressed debug sections are cached along with extraction results
+    return cache.directory if cache else None
+
+
+def as_stream(file):
+    """Wraps bytes, bytearray or memoryview in a seekable stream reading it without copies"""
+    if isinstance(file, (bytes, bytearray, memoryview)):
+        return MemoryViewStream(memoryview(file))
+
+    return file
+
+
+def read_header(file):
+    header = file.read(PROBE_SIZE)
+    file.seek(0)
+
+    return header
+
 
+def find_extractor(file, header=None, jobs=1, stats=None, selection=None, sections_dir=None, scope=None):
+    """Returns extractor instance which already tested the file"""
+    if header is None:
+        header = read_header(file)
 
-def find_extractor(file):
-    for extractor in all_extractors:
-        if extractor().test(file):
+    for extractor_class in iter_extractors(header):
+        extractor = extractor_class(jobs=jobs, stats=stats, selection=selection, sections_dir=sections_dir, scope=scope)
+        if extractor.test(file):
             return extractor
 
     return None
@@ -0,0 +1,90 @@
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+def cpu_time():
+    """CPU time of this process and its waited for children, so that worker processes are included"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def peak_rss():
+    """Returns peak resident set size in bytes of this process and of its largest child, or None"""
+    if resource is None:
+        return None, None
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+
+
+class Stats:
+    """Wall and CPU time spent in processing phases together with named counters"""
+    def __init__(self):
+        # Insertion ordered, phases are reported in the order they first ran
+        self.phases = {}
+        self.counters = {}
+
+    @contextmanager
+    def phase(self, name):
+        wall, cpu = time.perf_counter(), cpu_time()
+        try:
+            yield
+        finally:
+            totals = self.phases.setdefault(name, [0.0, 0.0])
+            totals[0] += time.perf_counter() - wall
+            totals[1] += cpu_time() - cpu
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def type_cache_hit_rate(self):
+        lookups = self.counters.get('type_cache_hits', 0) + self.counters.get('type_cache_misses', 0)
+        return self.counters.get('type_cache_hits', 0) / lookups if lookups else None
+
+    def workers_rss(self, children_rss):
+        """Peak rss of children is only attributed to workers when a pool of them ran, None otherwise"""
+        return children_rss if self.counters.get('worker_processes') else None
+
+    def as_dict(self):
+        rss, children_rss = peak_rss()
+        return {
+            'phases': {name: {'wall': wall, 'cpu': cpu} for name, (wall, cpu) in self.phases.items()},
+            'counters': dict(self.counters),
+            'type_cache_hit_rate': self.type_cache_hit_rate(),
+            'peak_rss': rss,
+            'peak_rss_children': self.workers_rss(children_rss)
+        }
+
+    def to_json(self):
+        return json.dumps(self.as_dict(), indent=2)
+
+    def report(self):
+        lines = [f'{"phase":<20}{"wall [s]":>10}{"cpu [s]":>10}']
+        for name, (wall, cpu) in self.phases.items():
+            lines.append(f'{name:<20}{wall:>10.3f}{cpu:>10.3f}')
+
+        lines.append('')
+        for name, value in self.counters.items():
+            lines.append(f'{name}: {value}')
+
+        hit_rate = self.type_cache_hit_rate()
+        if hit_rate is not None:
+            lines.append(f'type cache hit rate: {hit_rate:.1%}')
+
+        rss, children_rss = peak_rss()
+        if rss is not None:
+            lines.append(f'peak rss: {rss / (1 << 20):.1f} MB')
+            children_rss = self.workers_rss(children_rss)
+            if children_rss:
+                lines.append(f'peak rss of workers: {children_rss / (1 << 20):.1f} MB')
+
+        return '\n'.join(lines)
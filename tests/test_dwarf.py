@@ -0,0 +1,157 @@
+import os
+import platform
+import shutil
+import subprocess
+
+import pytest
+
+from extractdebug.extractors.dwarf import DwarfExtractor
+from extractdebug.extractors.extractor import Class, Method
+
+# Units sharing a copy of Shape, units in between and the one defining Shape::area through DW_FORM_ref_addr.
+# Two workers split nine units into shards of two, so the copy aliased in the first shard is referred to from the last.
+FILLER_UNITS = 6
+
+ABBREVIATIONS = '''
+    .section .debug_abbrev,"",@progbits
+.Ldebug_abbrev0:
+    .uleb128 1, 0x11
+    .byte 1
+    .uleb128 0x03, 0x08, 0x1b, 0x08, 0x10, 0x17, 0, 0
+    .uleb128 2, 0x02
+    .byte 1
+    .uleb128 0x03, 0x08, 0x0b, 0x0b, 0x3a, 0x0b, 0x3b, 0x0b, 0, 0
+    .uleb128 3, 0x0d
+    .byte 0
+    .uleb128 0x03, 0x08, 0x3a, 0x0b, 0x3b, 0x0b, 0x49, 0x13, 0x38, 0x0b, 0x32, 0x0b, 0, 0
+    .uleb128 4, 0x2e
+    .byte 1
+    .uleb128 0x3f, 0x19, 0x03, 0x08, 0x3a, 0x0b, 0x3b, 0x0b, 0x6e, 0x08, 0x49, 0x13, 0x32, 0x0b, 0x3c, 0x19, 0x64, 0x13, 0, 0
+    .uleb128 5, 0x05
+    .byte 0
+    .uleb128 0x49, 0x13, 0x34, 0x19, 0, 0
+    .uleb128 6, 0x24
+    .byte 0
+    .uleb128 0x03, 0x08, 0x0b, 0x0b, 0x3e, 0x0b, 0, 0
+    .uleb128 7, 0x0f
+    .byte 0
+    .uleb128 0x0b, 0x0b, 0x49, 0x13, 0, 0
+    .uleb128 8, 0x2e
+    .byte 0
+    .uleb128 0x47, 0x10, 0x11, 0x01, 0x12, 0x07, 0, 0
+    .byte 0
+'''
+
+
+def unit(name, body=''):
+    return f'''
+.L{name}:
+    .long .L{name}_end - .L{name} - 4
+    .value 4
+    .long .Ldebug_abbrev0
+    .byte 8
+    .uleb128 1
+    .string "{name}.cpp"
+    .string "/project"
+    .long .Ldebug_line0
+{body}
+    .byte 0
+.L{name}_end:
+'''
+
+
+def shape_unit(name):
+    """Unit with its own copy of class Shape { public: int width; int area(); }"""
+    return unit(name, f'''
+    .uleb128 2
+    .string "Shape"
+    .byte 4, 1, 1
+    .uleb128 3
+    .string "width"
+    .byte 1, 3
+    .long .L{name}_int - .L{name}
+    .byte 0, 1
+.L{name}_area:
+    .uleb128 4
+    .string "area"
+    .byte 1, 4
+    .string "_ZN5Shape4areaEv"
+    .long .L{name}_int - .L{name}
+    .byte 1
+    .long .L{name}_this - .L{name}
+.L{name}_this:
+    .uleb128 5
+    .long .L{name}_pointer - .L{name}
+    .byte 0
+    .byte 0
+.L{name}_int:
+    .uleb128 6
+    .string "int"
+    .byte 4, 5
+.L{name}_pointer:
+    .uleb128 7
+    .byte 8
+    .long .L{name}_int - .L{name}''')
+
+
+def assembly():
+    # Shape::area has no symbol, so its address comes from the definition only
+    units = [shape_unit('first'), shape_unit('copy')]
+    units += [unit(f'filler{i}') for i in range(FILLER_UNITS)]
+    units.append(unit('definition', '''
+    .uleb128 8
+    .long .Lcopy_area - .Ldebug_info0
+    .quad .Larea
+    .quad .Larea_end - .Larea'''))
+
+    return f'''
+    .text
+    .globl _start
+    .type _start, @function
+_start:
+    .file 1 "include/shape.h"
+    .loc 1 4 0
+    ret
+.Larea:
+    .loc 1 4 0
+    ret
+.Larea_end:
+    .section .debug_line,"",@progbits
+.Ldebug_line0:
+{ABBREVIATIONS}
+    .section .debug_info,"",@progbits
+.Ldebug_info0:
+{''.join(units)}
+'''
+
+
+@pytest.fixture(scope='module')
+def binary(tmp_path_factory):
+    if platform.machine() != 'x86_64' or not shutil.which('gcc'):
+        pytest.skip('Assembling the fixture needs gcc targeting x86-64')
+
+    directory = tmp_path_factory.mktemp('dwarf')
+    source = directory / 'specification.s'
+    source.write_text(assembly())
+    path = directory / 'specification'
+    subprocess.run(['gcc', '-nostdlib', '-no-pie', '-o', str(path), str(source)], check=True)
+    return str(path)
+
+
+def extract(path, jobs):
+    with open(path, 'rb') as file:
+        extractor = DwarfExtractor(jobs=jobs)
+        assert extractor.test(file)
+        return extractor.extract(file)
+
+
+def area_addresses(result):
+    return [member.low_pc for element in result.elements if isinstance(element, Class) and element.name == b'Shape'
+            for member in element.members if isinstance(member, Method) and member.name == b'area']
+
+
+def test_cross_unit_specification_of_aliased_copy(binary):
+    serial = area_addresses(extract(binary, jobs=1))
+    assert serial and all(serial)
+
+    assert area_addresses(extract(binary, jobs=2)) == serial
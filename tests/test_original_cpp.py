@@ -0,0 +1,61 @@
+import io
+import os
+import subprocess
+import sys
+
+from extractdebug.converters import OriginalCPPConverter
+from extractdebug.extractors.extractor import ExtractorResult, FileTable, Class, Field, Type
+from extractdebug.stats import Stats
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASE_DIR = b'/project'
+HEADERS = [b'shape.h', b'point.h', b'color.h', b'size.h', b'angle.h', b'layer.h', b'style.h', b'/usr/include/stdint.h']
+
+
+def create_result():
+    """Returns a unit with one class whose fields use types declared in several other headers"""
+    files = FileTable(BASE_DIR)
+    decl_file = files.intern(HEADERS[0], BASE_DIR)
+    fields = [Field(
+        name=f'field{i}'.encode('utf-8'),
+        type=Type(name=f'Type{i}'.encode('utf-8'), decl_file=(0, files.intern(header, BASE_DIR))),
+        accessibility=1,
+        decl_file=(0, decl_file)
+    ) for i, header in enumerate(HEADERS[1:])]
+
+    shape = Class(name=b'Shape', members=fields, decl_file=(0, decl_file))
+    return ExtractorResult(None, {0: {file.id: file for file in files.files.values()}}, [shape], BASE_DIR)
+
+
+def render(output_dir, incremental=False):
+    """Converts the unit into output_dir, returns the echoed headers and counters"""
+    stream = io.StringIO()
+    stats = Stats()
+    converter = OriginalCPPConverter(create_result(), {'includes': True, 'output_dir': output_dir, 'incremental': incremental}, stats=stats)
+    converter.convert(stream)
+    return stream.getvalue(), stats.counters
+
+
+def render_with_hash_seed(output_dir, seed):
+    script = f'import sys; sys.path.insert(0, {os.path.dirname(__file__)!r}); from test_original_cpp import render; print(render({output_dir!r})[0])'
+    return subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=dict(os.environ, PYTHONHASHSEED=str(seed)),
+                          check=True, capture_output=True, text=True).stdout
+
+
+def test_output_does_not_depend_on_hash_seed(tmp_path):
+    outputs = {render_with_hash_seed(str(tmp_path / str(seed)), seed) for seed in range(1, 6)}
+
+    assert len(outputs) == 1
+    assert '#include </usr/include/stdint.h>' in outputs.pop()
+
+
+def test_incremental_output_keeps_unchanged_headers(tmp_path):
+    first, counters = render(str(tmp_path), incremental=True)
+    assert counters['files_written'] == 1
+
+    second, counters = render(str(tmp_path), incremental=True)
+    assert second == first
+    assert counters.get('files_written', 0) == 0
+    assert counters['files_unchanged'] == 1
+    with open(tmp_path / 'shape.h') as file:
+        assert file.read() == first